@@ -0,0 +1,194 @@
+"""
+Crash-safe cache writes.
+
+Every cache producer writes to a temp file in the destination directory and
+publishes it with ``os.replace`` (atomic on the same filesystem), so a crash
+or kill mid-write never leaves a truncated file at the final path. Lookups go
+through ``valid_cache_entry``, which runs a cheap integrity check and evicts
+entries that are truncated or unreadable (e.g. written by an older version
+that wrote in place).
+"""
+import hashlib
+import json
+import os
+import struct
+import threading
+import uuid
+import wave
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Leftover temp files start with this so cache folder scans can skip them
+TEMP_PREFIX = ".tmp-"
+
+
+def is_temp_file(path: str) -> bool:
+    return os.path.basename(path).startswith(TEMP_PREFIX)
+
+
+@contextmanager
+def atomic_path(final_path: str):
+    """Yield a temp path next to *final_path* (same extension, so encoders pick
+    the right container); on success it is moved onto *final_path*, on error it
+    is removed."""
+    directory, name = os.path.split(os.path.abspath(final_path))
+    os.makedirs(directory, exist_ok=True)
+    ext = os.path.splitext(name)[1]
+    tmp_path = os.path.join(directory, f"{TEMP_PREFIX}{os.path.splitext(name)[0]}-{uuid.uuid4().hex[:8]}{ext}")
+    try:
+        yield tmp_path
+        if not os.path.exists(tmp_path):
+            raise RuntimeError(f"atomic write produced no file for {final_path}")
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    with atomic_path(path) as tmp:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def atomic_write_json(path: str, obj: Any, **dump_kwargs) -> None:
+    with atomic_path(path) as tmp:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def atomic_copy(src: str, dst: str) -> None:
+    import shutil
+    with atomic_path(dst) as tmp:
+        shutil.copy2(src, tmp)
+
+
+# ─── Content hashing ──────────────────────────────────────────────────────────
+
+_HASH_LOCK = threading.Lock()
+# (abspath, size, mtime_ns) -> sha256, so a file is only hashed once per process
+_HASHES: Dict[Tuple[str, int, int], str] = {}
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 of the file's contents (memoized per path/size/mtime)."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _HASH_LOCK:
+        cached = _HASHES.get(key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _HASH_LOCK:
+        _HASHES[key] = digest
+    return digest
+
+
+# ─── Integrity checks ─────────────────────────────────────────────────────────
+
+def is_valid_mp4(path: str) -> bool:
+    """Walk the top-level MP4 boxes: the file must contain ``moov`` and ``mdat``
+    and the boxes must exactly cover the file (a truncated write fails this)."""
+    try:
+        size = os.path.getsize(path)
+        seen = set()
+        with open(path, "rb") as f:
+            pos = 0
+            while pos < size:
+                f.seek(pos)
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                box_size, box_type = struct.unpack(">I4s", header)
+                if box_size == 1:
+                    ext = f.read(8)
+                    if len(ext) < 8:
+                        return False
+                    box_size = struct.unpack(">Q", ext)[0]
+                elif box_size == 0:
+                    box_size = size - pos  # box runs to end of file
+                if box_size < 8 or pos + box_size > size:
+                    return False
+                seen.add(box_type)
+                pos += box_size
+        return b"moov" in seen and b"mdat" in seen
+    except Exception:
+        return False
+
+
+def is_valid_json(path: str) -> bool:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            json.load(f)
+        return True
+    except Exception:
+        return False
+
+
+def is_valid_wav(path: str) -> bool:
+    """Header parses and the data chunk is fully present on disk."""
+    try:
+        with wave.open(path, "rb") as w:
+            expected = w.getnframes() * w.getnchannels() * w.getsampwidth()
+        return expected > 0 and os.path.getsize(path) >= expected + 44
+    except Exception:
+        return False
+
+
+def is_valid_mp3(path: str) -> bool:
+    """Non-empty and starts with an ID3 tag or an MPEG frame sync."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(3)
+        return len(head) == 3 and (head == b"ID3" or (head[0] == 0xFF and (head[1] & 0xE0) == 0xE0))
+    except Exception:
+        return False
+
+
+
+def is_valid_image(path: str) -> bool:
+    """Pillow can identify the image and its data is intact."""
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            img.verify()
+        return True
+    except Exception:
+        return False
+
+
+_VALIDATORS = {
+    ".mp4": is_valid_mp4,
+    ".json": is_valid_json,
+    ".wav": is_valid_wav,
+    ".mp3": is_valid_mp3,
+}
+
+
+def valid_cache_entry(path: str, validator: Optional[Callable[[str], bool]] = None) -> bool:
+    """True if *path* exists and passes its integrity check. Entries that exist
+    but fail the check are deleted so they get rebuilt."""
+    if not os.path.exists(path):
+        return False
+    check = validator or _VALIDATORS.get(os.path.splitext(path)[1].lower())
+    if check is None:
+        return os.path.getsize(path) > 0
+    if check(path):
+        return True
+    print(f"Warning: evicting corrupt cache entry {path}")
+    try:
+        os.remove(path)
+    except OSError as e:
+        print(f"Warning: failed to evict {path}: {e}")
+    return False
@@ -0,0 +1,57 @@
+"""
+Precomputed background plates.
+
+Each profile's background.png is cover-fitted (scale to cover, centre crop,
+RGB) once per (background content hash, size) and stored under cache/plates
+as a .npy that every renderer opens memory-mapped: buildShot's compositor,
+makeAllIdeasImage and, through it, every zoomintoidea index.
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+from PIL import Image
+
+from atomic_io import atomic_path, content_hash, valid_cache_entry
+from compositor import cover_plate
+
+CACHE_DIR = "cache/plates"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+_LOCK = threading.Lock()
+_PLATES: Dict[str, np.ndarray] = {}
+
+
+def plate_path(background_path: str, size: Tuple[int, int]) -> str:
+    key_src = f"{content_hash(background_path)}|{int(size[0])}x{int(size[1])}"
+    return os.path.join(CACHE_DIR, hashlib.md5(key_src.encode("utf-8")).hexdigest() + ".npy")
+
+
+def _is_valid_plate(path: str) -> bool:
+    try:
+        arr = np.load(path, mmap_mode="r")
+        return arr.ndim == 3 and arr.shape[2] == 3 and arr.dtype == np.uint8
+    except Exception:
+        return False
+
+
+def get_background_plate(background_path: str, size: Tuple[int, int]) -> np.ndarray:
+    """Cover-fitted HxWx3 uint8 plate of *background_path* at *size* (w, h),
+    memory-mapped read-only. Raises if the background cannot be read."""
+    path = plate_path(background_path, size)
+    with _LOCK:
+        plate = _PLATES.get(path)
+    if plate is not None:
+        return plate
+
+    if not valid_cache_entry(path, _is_valid_plate):
+        with Image.open(background_path) as img:
+            arr = cover_plate(img, (int(size[0]), int(size[1])))
+        with atomic_path(path) as tmp_path:
+            np.save(tmp_path, arr)
+    plate = np.load(path, mmap_mode="r")
+    with _LOCK:
+        _PLATES[path] = plate
+    return plate
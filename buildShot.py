@@ -1224,12 +1224,21 @@
 
 #     return cache_path
 
-from typing import List, Dict, Any, Tuple
-from moviepy import ImageClip, CompositeVideoClip, TextClip, VideoClip, vfx
+from typing import List, Dict, Any, Optional, Tuple
+from PIL import Image
+import numpy as np
 import os
 import hashlib
 import json
 import random
+from atomic_io import atomic_path, content_hash, is_valid_image, valid_cache_entry
+from compositor import Compositor, Layer, scale_raster
+from background_plate import get_background_plate
+from raster_cache import get_scaled_raster
+from text_raster import text_raster
+from render_quality import get_tier, scaled, scaled_size, aac_args, cache_tag
+from shard_render import render_sharded, frame_count
+from getAudioLength import getAudioLength
 
 # ===== Constants =====
 VIDEO_WIDTH = 1920
@@ -1270,36 +1279,157 @@ GROUP_WINDOW = 0.60              # seconds
 MAX_IMAGE_UPSCALE_ABS = 1.5
 MIN_SCALE = 0.35                 # never scale below this (for readability)
 
-def ease_out_cubic(t: float) -> float:
-    t = max(0.0, min(1.0, t))
-    return 1 - (1 - t) ** 3
-
-def _cache_path(media_plan: List[Dict[str, Any]], duration: float, font_path: str = "font.ttf", background_path: str = "background.png") -> str:
+def _cache_path(media_plan: List[Dict[str, Any]], duration: float, font_path: str = "font.ttf", background_path: str = "background.png",
+                audio_path: Optional[str] = None, trim_to_audio: bool = False,
+                hold_image: Optional[str] = None, hold_seconds: float = 0.0) -> str:
     font_path = os.path.abspath(font_path)
     background_path = os.path.abspath(background_path)
     media_plan_str = json.dumps(media_plan, sort_keys=True, separators=(',', ':'))
     # include mtimes to invalidate cache if assets change
     font_mtime = os.path.getmtime(font_path) if os.path.exists(font_path) else "NA"
     bg_mtime   = os.path.getmtime(background_path) if os.path.exists(background_path) else "NA"
-    key_src = f"{duration}|{media_plan_str}|{GROUP_WINDOW}|{EXIT_DURATION}|{MAX_ITEMS_PER_ROW}|{font_path}|{background_path}|{font_mtime}|{bg_mtime}".encode("utf-8")
+    key_src = f"{duration}|{media_plan_str}|{GROUP_WINDOW}|{EXIT_DURATION}|{MAX_ITEMS_PER_ROW}|{font_path}|{background_path}|{font_mtime}|{bg_mtime}{cache_tag()}"
+    # Finished shots (audio muxed, intro hold) are keyed by their inputs' contents
+    if audio_path:
+        key_src += f"|audio={content_hash(audio_path)}|trim={int(trim_to_audio)}"
+    if hold_image and hold_seconds > 0:
+        key_src += f"|hold={content_hash(hold_image)}|{hold_seconds:.3f}"
+    key_src = key_src.encode("utf-8")
     return os.path.join(CACHE_DIR, hashlib.md5(key_src).hexdigest() + ".mp4")
 
-def _hex(rgb: Tuple[int, int, int]) -> str:
-    return f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}"
+def _text_layer_raster(text: str, font_path: str, box: Tuple[int, int]) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Tight text raster for a full-frame text label laid out at *box* (w, h)
+    -> (RGBA scaled to the box, offset inside the box)."""
+    tight, (tx, ty) = text_raster(text, font_path, TEXT_FONT_SIZE, TEXT_COLOR, (VIDEO_WIDTH, VIDEO_HEIGHT))
+    sx, sy = box[0] / VIDEO_WIDTH, box[1] / VIDEO_HEIGHT
+    rgba = scale_raster(Image.fromarray(tight, "RGBA"), (int(round(tight.shape[1] * sx)), int(round(tight.shape[0] * sy))))
+    return rgba, (int(round(tx * sx)), int(round(ty * sy)))
 
-def buildShot(media_plan: List[Dict[str, Any]], duration: float, font_path: str = "font.ttf", background_path: str = "background.png") -> str:
+def _background_plate(background_path: str, size: Tuple[int, int]) -> np.ndarray:
+    """Cover-fit background plate at *size*, or a solid BACKGROUND_COLOR plate."""
+    try:
+        return get_background_plate(background_path, size)
+    except Exception:
+        # fallback to solid color to avoid crashes if image missing
+        plate = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        plate[...] = BACKGROUND_COLOR
+        return plate
+
+def _shot_frame_function(spec: Dict[str, Any]):
+    """shard_render builder: rebuild the shot's compositor from its plain-data
+    spec (runs once per render worker) and return its frame function."""
+    layers: List[Layer] = []
+    for ly in spec["layers"]:
+        if ly["path"]:
+            rgba, offset = get_scaled_raster(ly["path"], ly["size"]), (0, 0)
+        else:
+            rgba, offset = _text_layer_raster(ly["text"], spec["font_path"], ly["size"])
+        layers.append(Layer(rgba, ly["start"], ly["end"], ly["fade"], ly["base"], ly["exit"],
+                            offset=offset, box=ly["size"]))
+    compositor = Compositor(
+        _background_plate(spec["background_path"], spec["size"]), layers, spec["fps"],
+        entrance_duration=ENTRANCE_DURATION,
+        entrance_offset=spec["entrance_offset"],
+        exit_duration=EXIT_DURATION,
+    )
+    render = compositor.frame_function()
+    hold_frames = int(round(spec.get("hold_seconds", 0.0) * spec["fps"]))
+    if not spec.get("hold_image") or hold_frames <= 0:
+        return render
+
+    # The first hold_frames frames show the hold image instead of the shot
+    with Image.open(spec["hold_image"]) as im:
+        hold = scale_raster(im, spec["size"])[:, :, :3]
+    fps = spec["fps"]
+
+    def frame_function(t: float) -> np.ndarray:
+        if int(round(t * fps)) < hold_frames:
+            return hold
+        return render(t)
+    return frame_function
+
+def _output_duration(duration: float, audio_path: Optional[str], trim_to_audio: bool) -> float:
+    if audio_path and trim_to_audio:
+        return min(duration, getAudioLength(audio_path))
+    return duration
+
+def _render_shot(spec: Dict[str, Any], duration: float, cache_path: str,
+                 audio_path: Optional[str], trim_to_audio: bool) -> None:
+    """Encode the shot once: frames (time-sharded) plus the muxed audio."""
+    duration = _output_duration(duration, audio_path, trim_to_audio)
+    render_sharded(
+        _shot_frame_function, (spec,), duration, spec["fps"], spec["size"], cache_path,
+        audio_source=audio_path, audio_codec=aac_args() if audio_path else None,
+    )
+
+def buildShot(media_plan: List[Dict[str, Any]], duration: float, font_path: str = "font.ttf", background_path: str = "background.png",
+              audio_path: Optional[str] = None, trim_to_audio: bool = False,
+              hold_image: Optional[str] = None, hold_seconds: float = 0.0) -> str:
     """
     Groups media objects by time windows so items appearing around the same time render together as one group.
     Only one group is on-screen at a time. Groups are laid out as centered rows.
     When the next group starts, the previous group slides fully off-screen in a random (left/top/right) direction.
+
+    The finished shot is written in a single encode:
+      audio_path:    audio muxed into the shot (AAC); with trim_to_audio the shot ends with it
+      hold_image:    shown instead of the shot for its first hold_seconds (e.g. the previous shot's last frame)
     """
     if not isinstance(media_plan, list):
         raise ValueError("media_plan must be a list")
 
-    cache_path = _cache_path(media_plan, duration, font_path, background_path)
-    if os.path.exists(cache_path):
+    cache_path = _cache_path(media_plan, duration, font_path, background_path,
+                             audio_path, trim_to_audio, hold_image, hold_seconds)
+    if valid_cache_entry(cache_path):
         return cache_path
 
+    spec, final_duration = _plan_shot(media_plan, duration, font_path, background_path, hold_image, hold_seconds)
+
+    # ---- Compose & render (one time-sharded encode; published only once complete) ----
+    _render_shot(spec, final_duration, cache_path, audio_path, trim_to_audio)
+
+    return cache_path
+
+def getShotLastFrame(media_plan: List[Dict[str, Any]], duration: float, font_path: str = "font.ttf", background_path: str = "background.png",
+                     audio_path: Optional[str] = None, trim_to_audio: bool = False,
+                     hold_image: Optional[str] = None, hold_seconds: float = 0.0) -> str:
+    """
+    Last frame of the shot buildShot would produce for the same arguments, as a PNG,
+    computed from the plan (final group at rest over the background) without rendering
+    or decoding the shot. Lets every shot of a whole shot render concurrently.
+    """
+    if not isinstance(media_plan, list):
+        raise ValueError("media_plan must be a list")
+
+    png_path = os.path.splitext(_cache_path(media_plan, duration, font_path, background_path,
+                                            audio_path, trim_to_audio, hold_image, hold_seconds))[0] + "_lastframe.png"
+    if valid_cache_entry(png_path):
+        return png_path
+
+    spec, final_duration = _plan_shot(media_plan, duration, font_path, background_path, hold_image, hold_seconds)
+    n_frames = frame_count(_output_duration(final_duration, audio_path, trim_to_audio), spec["fps"])
+    frame = _shot_frame_function(spec)((n_frames - 1) / spec["fps"])
+    with atomic_path(png_path) as tmp_path:
+        Image.fromarray(np.ascontiguousarray(frame), "RGB").save(tmp_path)
+    return png_path
+
+def _plan_shot(media_plan: List[Dict[str, Any]], duration: float, font_path: str, background_path: str,
+               hold_image: Optional[str], hold_seconds: float) -> Tuple[Dict[str, Any], float]:
+    """Lay the shot out -> (render spec, shot duration before any audio trim)."""
+    # Layout is in nominal 1920x1080 coordinates; the render tier sets output pixels
+    tier = get_tier()
+    k = tier["scale"]
+    out_w, out_h = scaled_size((VIDEO_WIDTH, VIDEO_HEIGHT))
+    spec = {
+        "background_path": background_path,
+        "font_path": font_path,
+        "size": (out_w, out_h),
+        "fps": tier["fps"],
+        "entrance_offset": scaled(ENTRANCE_TRANSLATE_OFFSET),
+        "layers": [],
+        "hold_image": hold_image,
+        "hold_seconds": hold_seconds,
+    }
+
     # ---- Build base clips (collect sizes, types, appear times) ----
     items: List[Dict[str, Any]] = []
     for it in media_plan:
@@ -1309,40 +1439,32 @@ def buildShot(media_plan: List[Dict[str, Any]], duration: float, font_path: str
         is_image = "path" in it and it.get("path")
         if is_image:
             try:
-                clip = ImageClip(it["path"])
+                # Header only; the pixels come from the raster cache at layout size
+                with Image.open(it["path"]) as im:
+                    orig_w, orig_h = im.size
             except Exception as e:
                 print(f"Error loading image {it['path']}: {e}")
-                # Try to delete the corrupted file and skip this item
-                try:
-                    if os.path.exists(it["path"]):
-                        os.remove(it["path"])
-                        print(f"Deleted corrupted image: {it['path']}")
-                except:
-                    pass
+                # Cached images are written atomically, so a failed open means a corrupt
+                # file: evict it (after re-checking) so the next run fetches it again
+                valid_cache_entry(it["path"], is_valid_image)
                 continue  # Skip this corrupted image
         else:
-            clip = TextClip(
-                text=str(it.get("text", "")),
-                font_size=TEXT_FONT_SIZE,
-                color=_hex(TEXT_COLOR),
-                font=font_path,
-                size=(VIDEO_WIDTH, VIDEO_HEIGHT),
-            )
+            # Text is laid out as a full-frame label; only its tight raster is rendered
+            orig_w, orig_h = VIDEO_WIDTH, VIDEO_HEIGHT
         items.append({
-            "clip": clip,
+            "path": it["path"] if is_image else None,
+            "text": None if is_image else str(it.get("text", "")),
             "appearAt": appear_at,
             "is_image": is_image,
-            "orig_w": clip.w,
-            "orig_h": clip.h,
+            "orig_w": orig_w,
+            "orig_h": orig_h,
             "idx": len(items),
         })
 
     if not items:
-        from moviepy import ColorClip
-        ColorClip(size=(VIDEO_WIDTH, VIDEO_HEIGHT), color=BACKGROUND_COLOR, duration=max(0.1, duration)).write_videofile(
-            cache_path, fps=FPS, codec="libx264", audio=False, preset="medium"
-        )
-        return cache_path
+        # Solid BACKGROUND_COLOR plate (no background image), still with audio/hold
+        spec["background_path"] = None
+        return spec, max(0.1, duration)
 
     items.sort(key=lambda x: x["appearAt"])
     last_appear = max(x["appearAt"] for x in items)
@@ -1473,27 +1595,10 @@ def buildShot(media_plan: List[Dict[str, Any]], duration: float, font_path: str
     # Precompute group layouts
     group_layouts = {}
     for g in groups:
-        positions, scales, scaled_size = layout_group(g["indices"])
-        group_layouts[id(g)] = (positions, scales, scaled_size)
-
-    # ---- Background ----
-    try:
-        background_clip = ImageClip(background_path)
-        bg_scale = max(VIDEO_WIDTH / background_clip.w, VIDEO_HEIGHT / background_clip.h)
-        background_clip = background_clip.resized(bg_scale).with_duration(final_duration)
-        if background_clip.w > VIDEO_WIDTH or background_clip.h > VIDEO_HEIGHT:
-            background_clip = background_clip.cropped(
-                x_center=background_clip.w / 2, y_center=background_clip.h / 2,
-                width=VIDEO_WIDTH, height=VIDEO_HEIGHT
-            )
-    except Exception:
-        # fallback to solid color to avoid crashes if image missing
-        from moviepy import ColorClip
-        background_clip = ColorClip(size=(VIDEO_WIDTH, VIDEO_HEIGHT), color=BACKGROUND_COLOR, duration=final_duration)
-
-    composed: List[VideoClip] = [background_clip]
+        positions, scales, item_sizes = layout_group(g["indices"])
+        group_layouts[id(g)] = (positions, scales, item_sizes)
 
-    # --- helpers: exact-but-safe offscreen targets + hard integer clamps ---
+    # --- helpers: exact-but-safe offscreen targets ---
     def _offscreen_targets(exit_dir: str, bx: int, by: int, w_int: int, h_int: int):
         """
         Use -w+1 / W-1 / -h+1 to avoid 0-width/height slices during mask compose.
@@ -1501,89 +1606,58 @@ def buildShot(media_plan: List[Dict[str, Any]], duration: float, font_path: str
         if exit_dir == "left":
             return (-w_int + 1, by)
         elif exit_dir == "right":
-            return (VIDEO_WIDTH - 1, by)
+            return (out_w - 1, by)
         else:  # "top"
             return (bx, -h_int + 1)
 
-    def _clamp_xy(x: int, y: int, w_int: int, h_int: int) -> Tuple[int, int]:
-        # Keep top-left within safe compositor bounds (never fully beyond).
-        x = max(-w_int + 1, min(VIDEO_WIDTH - 1, x))
-        y = max(-h_int + 1, min(VIDEO_HEIGHT - 1, y))
-        return x, y
-
-    # ---- Build animated clips per item (entrance + group exit slide) ----
+    # ---- Build animated layer specs per item (entrance + group exit slide) ----
+    # Plain data, so render workers can rebuild the compositor (see _shot_frame_function)
+    layer_specs: List[Dict[str, Any]] = []
     for g in groups:
         g_id = id(g)
         g_start = g["start"]
         g_end = g["end"]
         exit_dir = g["exit_dir"]
-        positions, scales, scaled_size = group_layouts[g_id]
+        positions, scales, item_sizes = group_layouts[g_id]
 
         for idx in g["indices"]:
             base = items[idx]
-            clip = base["clip"]
             appear_at = base["appearAt"]
 
             # duration bounded by the group end (no overlap with next group)
             clip_duration = max(0.01, g_end - appear_at)
             fade_dur = min(ENTRANCE_DURATION, clip_duration)
 
-            # force integer geometry
-            base_x = int(round(positions[idx][0]))
-            base_y = int(round(positions[idx][1]))
+            # force integer geometry (output pixels)
+            base_x = int(round(positions[idx][0] * k))
+            base_y = int(round(positions[idx][1] * k))
             s = scales[idx]
-            w_s, h_s = scaled_size[idx]
-            w_int = int(round(w_s))
-            h_int = int(round(h_s))
+            w_s, h_s = item_sizes[idx]
+            w_int = max(1, int(round(w_s * k)))
+            h_int = max(1, int(round(h_s * k)))
             bx = int(round(base_x))
             by = int(round(base_y))
             ox, oy = _offscreen_targets(exit_dir, bx, by, w_int, h_int)
 
-            def pos_fn_factory(_appear_at, _g_end, bx, by, ox, oy, w_int, h_int):
-                def _pos(local_t: float):
-                    local_t = 0.0 if local_t is None else max(0.0, local_t)
-                    global_t = _appear_at + local_t
-
-                    # entrance: slide up from below
-                    if local_t < ENTRANCE_DURATION:
-                        p = ease_out_cubic(local_t / ENTRANCE_DURATION)
-                        x = bx
-                        y = by + int(round(ENTRANCE_TRANSLATE_OFFSET * (1 - p)))
-                        return _clamp_xy(int(x), int(y), w_int, h_int)
-
-                    # exit: last EXIT_DURATION of the group
-                    if global_t >= (_g_end - EXIT_DURATION):
-                        u = (global_t - (_g_end - EXIT_DURATION)) / EXIT_DURATION
-                        u = 0.0 if u < 0 else 1.0 if u > 1 else ease_out_cubic(u)
-                        x = bx + int(round((ox - bx) * u))
-                        y = by + int(round((oy - by) * u))
-                        return _clamp_xy(int(x), int(y), w_int, h_int)
-
-                    # hold
-                    return _clamp_xy(bx, by, w_int, h_int)
-                return _pos
-
-            animated = (
-                clip
-                .with_start(appear_at)
-                .with_duration(clip_duration)
-                .with_position(pos_fn_factory(appear_at, g_end, bx, by, ox, oy, w_int, h_int))
-                .with_effects([
-                    vfx.Resize(s),
-                    vfx.CrossFadeIn(fade_dur),
-                ])
-            )
-            composed.append(animated)
-
-    # ---- Compose & render ----
-    CompositeVideoClip(composed, size=(VIDEO_WIDTH, VIDEO_HEIGHT)) \
-        .with_duration(final_duration) \
-        .write_videofile(
-            cache_path,
-            fps=FPS,
-            codec="libx264",
-            audio=False,
-            preset="medium",
-        )
-
-    return cache_path
+            # Scale the source exactly once (warms the raster caches for the workers)
+            if base["is_image"]:
+                try:
+                    get_scaled_raster(base["path"], (w_int, h_int))
+                except Exception as e:
+                    print(f"Warning: failed to decode image {base['path']}: {e}")
+                    continue
+            else:
+                text_raster(base["text"], font_path, TEXT_FONT_SIZE, TEXT_COLOR, (VIDEO_WIDTH, VIDEO_HEIGHT))
+            layer_specs.append({
+                "path": base["path"],
+                "text": base.get("text"),
+                "size": (w_int, h_int),
+                "start": appear_at,
+                "end": appear_at + clip_duration,
+                "fade": fade_dur,
+                "base": (bx, by),
+                "exit": (ox, oy),
+            })
+
+    spec["layers"] = layer_specs
+    return spec, final_duration
@@ -0,0 +1,141 @@
+import os
+import re
+import json
+import subprocess
+import wave
+from typing import Optional, Dict, Any
+
+from atomic_io import atomic_path, atomic_write_json, valid_cache_entry
+
+# Canonical audio layout used everywhere downstream of TTS: what overlayAudioVideo,
+# combineVideos and create9x16Video would otherwise resample every input to.
+CANONICAL_SAMPLE_RATE = 48000
+CANONICAL_CHANNELS = 2
+CANONICAL_CODEC = "pcm_s16le"
+
+
+def canonical_path(audio_path: str) -> str:
+    """Path of the canonical 48 kHz stereo PCM WAV derivative of *audio_path*."""
+    root, ext = os.path.splitext(audio_path)
+    if ext.lower() == ".wav":
+        return audio_path
+    return root + ".wav"
+
+
+def meta_path(audio_path: str) -> str:
+    # Keyed on the full filename: a source mp3 and its canonical WAV share a stem,
+    # and only the WAV is in canonical layout
+    return audio_path + ".meta.json"
+
+
+def getAudioMeta(audio_path: str) -> Optional[Dict[str, Any]]:
+    """Return stored {duration, sample_rate, channels, loudness_lufs, true_peak_dbfs}
+    for the canonical WAV *audio_path*, or None if not yet computed (or not a
+    canonical WAV)."""
+    path = meta_path(audio_path)
+    if not valid_cache_entry(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: failed to read audio metadata {path}: {e}")
+        return None
+
+
+def write_wav_meta(wav_path: str, loudness_lufs: Optional[float] = None, true_peak_dbfs: Optional[float] = None) -> Dict[str, Any]:
+    """Write the metadata sidecar for a canonical WAV (duration from its header)."""
+    with wave.open(wav_path, "rb") as w:
+        sr = w.getframerate()
+        meta = {
+            "duration": w.getnframes() / float(sr),
+            "sample_rate": sr,
+            "channels": w.getnchannels(),
+            "loudness_lufs": loudness_lufs,
+            "true_peak_dbfs": true_peak_dbfs,
+        }
+    atomic_write_json(meta_path(wav_path), meta, indent=2)
+    return meta
+
+
+def _parse_ebur128(stderr: str):
+    """Pull integrated loudness (LUFS) and true peak (dBFS) from ffmpeg's ebur128 summary."""
+    loudness = peak = None
+    m = re.search(r"Integrated loudness:\s*I:\s*(-?[\d.]+|-inf)\s*LUFS", stderr)
+    if m and m.group(1) != "-inf":
+        loudness = float(m.group(1))
+    m = re.search(r"True peak:\s*Peak:\s*(-?[\d.]+|-inf)\s*dBFS", stderr)
+    if m and m.group(1) != "-inf":
+        peak = float(m.group(1))
+    return loudness, peak
+
+
+def getCanonicalAudio(audio_path: str) -> str:
+    """Return the canonical 48 kHz stereo PCM WAV for *audio_path*, creating it
+    (and its duration/loudness sidecar) on first use.
+
+    The decode, resample and loudness measurement happen in a single ffmpeg
+    pass, so every later consumer can use the WAV without resampling again.
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    wav_path = canonical_path(audio_path)
+    if wav_path == audio_path:
+        # Already a WAV; make sure it has metadata and is in canonical layout
+        if getAudioMeta(wav_path) is None:
+            with wave.open(wav_path, "rb") as w:
+                ok = (w.getframerate() == CANONICAL_SAMPLE_RATE and w.getnchannels() == CANONICAL_CHANNELS
+                      and w.getsampwidth() == 2)
+            if not ok:
+                raise ValueError(f"{wav_path} is a WAV but not in canonical 48 kHz stereo s16 layout")
+            write_wav_meta(wav_path)
+        return wav_path
+
+    if valid_cache_entry(wav_path) and getAudioMeta(wav_path) is not None:
+        return wav_path
+
+    try:
+        with atomic_path(wav_path) as tmp_path:
+            cmd = [
+                'ffmpeg', '-hide_banner', '-nostats',
+                '-i', audio_path,
+                '-af', 'ebur128=peak=true:framelog=quiet',
+                '-ar', str(CANONICAL_SAMPLE_RATE),
+                '-ac', str(CANONICAL_CHANNELS),
+                '-c:a', CANONICAL_CODEC,
+                '-y', tmp_path,
+            ]
+            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to create canonical audio for {audio_path}: {e.stderr}")
+
+    loudness, peak = _parse_ebur128(result.stderr or "")
+    write_wav_meta(wav_path, loudness, peak)
+    return wav_path
+
+
+def probe_audio_stream(path: str) -> Optional[Dict[str, Any]]:
+    """Return the first audio stream's ffprobe info for *path*, or None."""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error', '-select_streams', 'a:0',
+            '-show_entries', 'stream=codec_name,sample_rate,channels',
+            '-print_format', 'json', path
+        ], capture_output=True, text=True, check=True)
+        streams = json.loads(result.stdout).get("streams") or []
+        return streams[0] if streams else None
+    except Exception:
+        return None
+
+
+def is_canonical_aac(path: str) -> bool:
+    """True if *path*'s audio is already AAC at 48 kHz stereo, i.e. can be stream-copied."""
+    info = probe_audio_stream(path)
+    if not info:
+        return False
+    return (
+        info.get("codec_name") == "aac"
+        and int(info.get("sample_rate") or 0) == CANONICAL_SAMPLE_RATE
+        and int(info.get("channels") or 0) == CANONICAL_CHANNELS
+    )
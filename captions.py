@@ -4,10 +4,14 @@ from typing import List, Tuple, Optional
 
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from faster_whisper import WhisperModel
 from moviepy import VideoFileClip, ImageClip, CompositeVideoClip
 from moviepy.video.VideoClip import VideoClip
 
+from whisper_models import load_whisper_config
+from transcription import transcribe_words
+from render_quality import scaled
+from shard_render import render_sharded
+
 
 # ===== Caption Config =====
 CAPTION_FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "font.ttf")  # default; can be overridden
@@ -32,9 +36,13 @@ CAPTION_PRE_ROLL_S = 0.02
 CAPTION_POST_ROLL_S = 0.10
 
 # ===== Whisper Config =====
-WHISPER_MODEL_SIZE = "small"
+# Model, compute type and beam size follow whisper_config.json (whisperBenchmark.py) when present
+_WHISPER_CFG = load_whisper_config()
+WHISPER_MODEL_SIZE = _WHISPER_CFG["model"]
 WHISPER_DEVICE = "cpu"  # 'cpu' keeps it simple and works everywhere
-WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_COMPUTE_TYPE = _WHISPER_CFG["compute_type"]
+WHISPER_BEAM_SIZE = _WHISPER_CFG["beam_size"]
+WHISPER_CPU_THREADS = _WHISPER_CFG["cpu_threads"]
 
 
 def _transcribe_words(video_path: str) -> List[dict]:
@@ -42,34 +50,27 @@ def _transcribe_words(video_path: str) -> List[dict]:
     Transcribe video with faster-whisper and return a flat list of words
     with start/end timestamps: [{"text": str, "start": float, "end": float}].
     """
-    model = WhisperModel(WHISPER_MODEL_SIZE, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
-    segments, _info = model.transcribe(
+    raw = transcribe_words(
         video_path,
-        word_timestamps=True,
-        vad_filter=True,
-        beam_size=5,
+        WHISPER_MODEL_SIZE,
+        WHISPER_DEVICE,
+        WHISPER_COMPUTE_TYPE,
         language=None,
+        vad_filter=True,
+        beam_size=WHISPER_BEAM_SIZE,
+        cpu_threads=WHISPER_CPU_THREADS,
     )
 
     words: List[dict] = []
-    for seg in segments:
-        if not getattr(seg, "words", None):
-            # fallback to segment-level text if words missing
-            words.append({
-                "text": seg.text.strip(),
-                "start": float(seg.start),
-                "end": float(seg.end),
-            })
+    for w in raw:
+        text = (w["word"] or "").strip()
+        if not text:
             continue
-        for w in seg.words:
-            text = (w.word or "").strip()
-            if not text:
-                continue
-            words.append({
-                "text": text,
-                "start": float(w.start),
-                "end": float(w.end),
-            })
+        words.append({
+            "text": text,
+            "start": float(w["start"]),
+            "end": float(w["end"]),
+        })
     return words
 
 
@@ -162,6 +163,26 @@ def _probe_video_fps(path: str) -> float:
     return 0.0
 
 
+def _probe_entry(path: str, entry: str, stream: Optional[str] = None) -> str:
+    """Raw ffprobe value of *entry* (e.g. "format=duration") or "" on failure."""
+    cmd = ["ffprobe", "-v", "error"]
+    if stream:
+        cmd += ["-select_streams", stream]
+    cmd += ["-show_entries", entry, "-of", "default=noprint_wrappers=1:nokey=1", path]
+    try:
+        r = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return r.stdout.strip()
+    except Exception:
+        return ""
+
+
+def _probe_seconds(path: str, entry: str, stream: Optional[str] = None) -> float:
+    try:
+        return max(0.0, float(_probe_entry(path, entry, stream).splitlines()[0]))
+    except Exception:
+        return 0.0
+
+
 def _probe_video_stream_duration_seconds(path: str) -> float:
     # Prefer frame count / fps to avoid container-level audio duration
     nb = _probe_video_nb_frames(path)
@@ -169,25 +190,23 @@ def _probe_video_stream_duration_seconds(path: str) -> float:
     if nb > 0 and fps > 0:
         return nb / fps
     # Fallback to container duration
-    try:
-        r = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                path,
-            ],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        return max(0.0, float(r.stdout.strip()))
-    except Exception:
-        return 0.0
+    return _probe_seconds(path, "format=duration")
+
+
+def _caption_timeline(video_path: str):
+    """(size, fps, video stream duration, target duration) of *video_path*,
+    from ffprobe alone. The target spans the longest of the video stream,
+    the audio stream and the container, so captions run to the audio end."""
+    dims = _probe_entry(video_path, "stream=width,height", "v:0").split()
+    size = (int(dims[0]), int(dims[1]))
+    fps = _probe_video_fps(video_path) or 30.0
+    video_stream_duration = _probe_video_stream_duration_seconds(video_path)
+    target_duration = max(
+        video_stream_duration,
+        _probe_seconds(video_path, "stream=duration", "a:0"),
+        _probe_seconds(video_path, "format=duration"),
+    )
+    return size, fps, video_stream_duration, target_duration
 
 
 def _measure_text_bbox(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont, stroke_width: int) -> Tuple[int, int]:
@@ -246,20 +265,23 @@ def _render_caption_image(
     """
     vw, vh = video_size
     max_text_width = int(vw * CAPTION_MAX_WIDTH_RATIO)
+    # Font metrics follow the render tier's scale (the video is already scaled)
+    font_size = scaled(CAPTION_FONT_SIZE)
+    stroke_width = scaled(CAPTION_STROKE_WIDTH)
 
     # Create a temporary small canvas for measurement
     tmp_img = Image.new("RGBA", (max(10, max_text_width), 200), (0, 0, 0, 0))
     draw = ImageDraw.Draw(tmp_img)
-    font = ImageFont.truetype(CAPTION_FONT_PATH, CAPTION_FONT_SIZE)
+    font = ImageFont.truetype(CAPTION_FONT_PATH, font_size)
 
     lines, line_widths = _wrap_words_to_lines(
-        snippet_words, draw, font, CAPTION_STROKE_WIDTH, max_text_width, CAPTION_MAX_LINES
+        snippet_words, draw, font, stroke_width, max_text_width, CAPTION_MAX_LINES
     )
 
     # Compute line height and total height
     ascent, descent = font.getmetrics()
     base_line_height = ascent + descent
-    interline_px = int(round(CAPTION_FONT_SIZE * 0.28))
+    interline_px = int(round(font_size * 0.28))
     total_h = base_line_height * len(lines) + interline_px * (len(lines) - 1)
 
     # Final image spans full video width to simplify centering; height fits text
@@ -290,10 +312,10 @@ def _render_caption_image(
         accum = ""
         for wi, w in enumerate(line):
             before = (accum + (" " if accum else "")) + w
-            w_w, _ = _measure_text_bbox(d, before, font, CAPTION_STROKE_WIDTH)
+            w_w, _ = _measure_text_bbox(d, before, font, stroke_width)
             # offset for current word is width of previous accum
             if accum:
-                prev_w, _ = _measure_text_bbox(d, accum, font, CAPTION_STROKE_WIDTH)
+                prev_w, _ = _measure_text_bbox(d, accum, font, stroke_width)
             else:
                 prev_w = 0
             x_offsets.append(x_start + prev_w)
@@ -304,7 +326,7 @@ def _render_caption_image(
             text_line,
             font=font,
             fill=CAPTION_COLOR,
-            stroke_width=CAPTION_STROKE_WIDTH,
+            stroke_width=stroke_width,
             stroke_fill=CAPTION_STROKE_COLOR,
             align="center",
         )
@@ -331,39 +353,23 @@ def _render_caption_image(
                     the_word,
                     font=font,
                     fill=CAPTION_HIGHLIGHT_COLOR,
-                    stroke_width=CAPTION_STROKE_WIDTH,
+                    stroke_width=stroke_width,
                     stroke_fill=CAPTION_STROKE_COLOR,
                 )
 
     return img
 
 
-def add_tiktok_captions(video_path: str, output_path: Optional[str] = None, font_path: Optional[str] = None) -> str:
-    """
-    Transcribe the input video and burn TikTok-style captions.
-    Returns the output path written to disk.
-    """
-    # allow caller to inject profile font
-    if font_path:
-        global CAPTION_FONT_PATH
-        CAPTION_FONT_PATH = font_path
-    words = _transcribe_words(video_path)
-    if not words:
-        return video_path
-
-    # Durations
-    video_stream_duration = float(_probe_video_stream_duration_seconds(video_path) or 0.0)
-    base_raw = VideoFileClip(video_path)
-    try:
-        audio_duration = float(base_raw.audio.duration) if base_raw.audio else 0.0
-    except Exception:
-        audio_duration = 0.0
-    container_duration = float(base_raw.duration or 0.0)
-    target_duration = max(video_stream_duration, audio_duration, container_duration)
+def _caption_composite(video_path: str, words: List[dict], timeline):
+    """Base video (last frame frozen to the audio end) plus one caption clip
+    per word, over *timeline* (from _caption_timeline). Video only: the
+    render muxes the source's audio stream in. Returns (composite, clips to close)."""
+    (vw, vh), fps, video_stream_duration, target_duration = timeline
+    base_raw = VideoFileClip(video_path, audio=False)
 
     # Freeze last frame after the video stream ends, so video spans full audio
     eps = 1.0 / float(base_raw.fps or 30.0) / 2.0
-    safe_last_t = max(0.0, (video_stream_duration or container_duration) - eps)
+    safe_last_t = max(0.0, (video_stream_duration or float(base_raw.duration or 0.0)) - eps)
     last_frame_img = base_raw.get_frame(safe_last_t)
 
     def _frozen_frame_fn(t: float):
@@ -374,11 +380,8 @@ def add_tiktok_captions(video_path: str, output_path: Optional[str] = None, font
         return last_frame_img
 
     base = VideoClip(frame_function=_frozen_frame_fn).with_duration(target_duration)
-    base.fps = base_raw.fps
-    base.size = base_raw.size
-    if base_raw.audio is not None:
-        base.audio = base_raw.audio
-    vw, vh = base.w, base.h
+    base.fps = fps
+    base.size = (vw, vh)
     clips: List[ImageClip] = []
 
     total_dur = float(target_duration)
@@ -461,6 +464,43 @@ def add_tiktok_captions(video_path: str, output_path: Optional[str] = None, font
 
     # Ensure composite has a defined duration matching the target timeline (audio end)
     comp = CompositeVideoClip([base] + clips, size=(vw, vh)).with_duration(total_dur)
+    return comp, [comp, base, base_raw] + clips
+
+
+def _caption_frame_function(video_path: str, words: List[dict], font_path: str, timeline):
+    """shard_render builder: build the caption composite in a render worker."""
+    global CAPTION_FONT_PATH
+    CAPTION_FONT_PATH = font_path
+    comp, _clips = _caption_composite(video_path, words, timeline)
+    return comp.get_frame
+
+
+def add_tiktok_captions(video_path: str, output_path: Optional[str] = None, font_path: Optional[str] = None,
+                        words: Optional[List[dict]] = None) -> str:
+    """
+    Transcribe the input video and burn TikTok-style captions.
+    If *words* ([{"word" or "text", "start", "end"}], seconds from the start of
+    the video) are already known they are used instead of transcribing.
+    Returns the output path written to disk.
+    """
+    # allow caller to inject profile font
+    if font_path:
+        global CAPTION_FONT_PATH
+        CAPTION_FONT_PATH = font_path
+    if words is not None:
+        words = [
+            {"text": str(w.get("text", w.get("word", ""))).strip(), "start": float(w["start"]), "end": float(w["end"])}
+            for w in words
+        ]
+        words = [w for w in words if w["text"]]
+    else:
+        words = _transcribe_words(video_path)
+    if not words:
+        return video_path
+
+    # Size, rate and duration from ffprobe; caption clips are only built in the render workers
+    timeline = _caption_timeline(video_path)
+    (vw, vh), fps, _video_stream_duration, total_dur = timeline
 
     if output_path is None:
         base_dir, base_name = os.path.split(video_path)
@@ -478,22 +518,12 @@ def add_tiktok_captions(video_path: str, output_path: Optional[str] = None, font
     else:
         target_path = out_abs
 
-    comp.write_videofile(
-        target_path,
-        codec="libx264",
-        audio_codec="aac",
-        fps=base.fps or 30,
-        preset="medium",
-        threads=0,
-        logger=None,
+    # Time-sharded render; the source's audio stream is copied in
+    render_sharded(
+        _caption_frame_function, (video_path, words, CAPTION_FONT_PATH, timeline),
+        total_dur, fps, (vw, vh), target_path, audio_source=video_path,
     )
 
-    base.close()
-    base_raw.close()
-    comp.close()
-    for c in clips:
-        c.close()
-
     return target_path
 
 
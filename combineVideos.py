@@ -2,6 +2,7 @@ import subprocess
 import os
 import json
 from typing import List
+from render_quality import get_tier, x264_args, aac_args
 
 
 def _has_audio_stream(path: str) -> bool:
@@ -41,11 +42,12 @@ def combineVideos(video_paths: List[str], output_path: str) -> str:
     video_paths = [os.path.normpath(path) for path in video_paths]
     output_path = os.path.normpath(output_path)
     
-    # Normalize all inputs to consistent params (video: 1920x1080 30fps yuv420p h264; audio: AAC LC 48kHz stereo)
+    # Normalize all inputs to consistent params (video: render-tier fps yuv420p h264; audio: AAC LC 48kHz stereo)
     # Use absolute path for normalization directory to avoid relative path duplication in concat list
     norm_dir = os.path.abspath(os.path.join(os.path.dirname(output_path) or '.', '__concat_norm__'))
     os.makedirs(norm_dir, exist_ok=True)
     normalized_paths: List[str] = []
+    fps = str(get_tier()["fps"])
 
     for i, in_path in enumerate(video_paths):
         norm_path = os.path.join(norm_dir, f"{i:04d}.mp4")
@@ -55,12 +57,11 @@ def combineVideos(video_paths: List[str], output_path: str) -> str:
             cmd = [
                 'ffmpeg', '-hide_banner', '-loglevel', 'error',
                 '-i', in_path,
-                '-c:v', 'libx264',
+                *x264_args(),
                 '-pix_fmt', 'yuv420p',
-                '-r', '30',
+                '-r', fps,
                 '-vsync', 'cfr',
-                '-c:a', 'aac',
-                '-b:a', '192k',
+                *aac_args(),
                 '-ar', '48000',               # resample to 48k for concat stability
                 '-ac', '2',
                 '-af', 'aresample=async=1:first_pts=0',
@@ -74,12 +75,11 @@ def combineVideos(video_paths: List[str], output_path: str) -> str:
                 '-i', in_path,
                 '-f', 'lavfi', '-t', '1', '-i', 'anullsrc=r=48000:cl=stereo',
                 '-shortest',
-                '-c:v', 'libx264',
+                *x264_args(),
                 '-pix_fmt', 'yuv420p',
-                '-r', '30',
+                '-r', fps,
                 '-vsync', 'cfr',
-                '-c:a', 'aac',
-                '-b:a', '192k',
+                *aac_args(),
                 '-ar', '48000',
                 '-ac', '2',
                 '-movflags', '+faststart',
@@ -112,8 +112,7 @@ def combineVideos(video_paths: List[str], output_path: str) -> str:
             '-safe', '0',
             '-i', concat_file,
             '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-b:a', '192k',
+            *aac_args(),
             '-ar', '48000',
             '-ac', '2',
             '-af', 'aresample=async=1:first_pts=0',
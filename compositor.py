@@ -0,0 +1,177 @@
+"""
+NumPy frame compositor used by buildShot.
+
+moviepy's CompositeVideoClip re-resizes every source on every frame and calls
+a Python position/effect callback per clip per frame. Here each raster is
+scaled exactly once up front, every layer's position and opacity is sampled
+per frame into animation tracks (animation_tracks.py), and frames are
+produced by blitting into one reusable uint8 buffer with vectorized slicing.
+Opaque rasters at full opacity are plain slice copies.
+
+Between entrances and exits nothing on screen moves: consecutive frames with
+identical tracks form a static span, which is composited once and the same
+buffer is handed back for every following frame.
+
+Layout/animation semantics match the moviepy version of buildShot: a layer
+is visible for start <= t < end, fades in linearly over ``fade`` seconds
+(CrossFadeIn), slides up from ``entrance_offset`` px below its base position
+(ease-out cubic) and slides to its off-screen target during the last
+``exit_duration`` seconds before ``end``.
+"""
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from animation_tracks import AnimationTracks
+
+
+def to_rgba_array(img: Image.Image) -> np.ndarray:
+    """PIL image -> HxWx4 uint8 array."""
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    return np.asarray(img, dtype=np.uint8)
+
+
+def scale_raster(img: Image.Image, size: Tuple[int, int]) -> np.ndarray:
+    """Resize *img* once to *size* (w, h) with LANCZOS and return RGBA uint8."""
+    w, h = max(1, int(size[0])), max(1, int(size[1]))
+    if img.size != (w, h):
+        img = img.resize((w, h), Image.LANCZOS)
+    return to_rgba_array(img)
+
+
+def cover_plate(img: Image.Image, size: Tuple[int, int]) -> np.ndarray:
+    """Cover-fit *img* to *size* (scale to cover, centre crop) -> HxWx3 uint8."""
+    W, H = size
+    scale = max(W / img.width, H / img.height)
+    new_size = (max(W, int(round(img.width * scale))), max(H, int(round(img.height * scale))))
+    img = img.convert("RGB").resize(new_size, Image.LANCZOS)
+    left = (new_size[0] - W) // 2
+    top = (new_size[1] - H) // 2
+    return np.asarray(img.crop((left, top, left + W, top + H)), dtype=np.uint8)
+
+
+class Layer:
+    """One pre-scaled raster plus its timing and motion.
+
+    Motion is computed for the layer's layout *box* (default: the raster's
+    size); the raster is drawn *offset* pixels inside it. A tight crop of a
+    mostly transparent raster therefore moves exactly like the full one.
+    """
+
+    __slots__ = ("rgb", "alpha", "opaque", "start", "end", "fade", "base", "exit", "offset", "box")
+
+    def __init__(self, rgba: np.ndarray, start: float, end: float, fade: float,
+                 base: Tuple[int, int], exit: Tuple[int, int],
+                 offset: Tuple[int, int] = (0, 0), box: Optional[Tuple[int, int]] = None):
+        rgba = np.ascontiguousarray(rgba)
+        self.rgb = rgba[:, :, :3]
+        alpha = rgba[:, :, 3]
+        self.opaque = bool(alpha.min() == 255)
+        # uint16 so blends can multiply without overflow
+        self.alpha = None if self.opaque else alpha.astype(np.uint16)[:, :, None]
+        self.start = float(start)
+        self.end = float(end)
+        self.fade = float(fade)
+        self.base = (int(base[0]), int(base[1]))
+        self.exit = (int(exit[0]), int(exit[1]))
+        self.offset = (int(offset[0]), int(offset[1]))
+        self.box = (int(box[0]), int(box[1])) if box else self.size
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+
+class Compositor:
+    """Produces frames for a background plate plus animated layers."""
+
+    def __init__(self, background: np.ndarray, layers: List[Layer], fps: int,
+                 entrance_duration: float, entrance_offset: int, exit_duration: float):
+        self.background = np.ascontiguousarray(background[:, :, :3], dtype=np.uint8)
+        self.height, self.width = self.background.shape[:2]
+        self.layers = layers
+        self.fps = fps
+        self.entrance_duration = entrance_duration
+        self.entrance_offset = entrance_offset
+        self.exit_duration = exit_duration
+        # Sample every layer's motion up to the last layer's end (background only after)
+        last_end = max((ly.end for ly in layers), default=0.0)
+        self.tracks = AnimationTracks.build(
+            layers, fps, int(math.ceil(last_end * fps)) + 1, (self.width, self.height),
+            entrance_duration, entrance_offset, exit_duration,
+        )
+        self._runs = self.tracks.runs()
+        self._buf = np.empty_like(self.background)
+        self._buf_run: Optional[int] = None  # run of identical frames currently held in _buf
+
+    # ---- static spans ----
+    def _run_at(self, i: int) -> int:
+        # Past the tracks only the background is shown: one final run
+        return int(self._runs[i]) if i < len(self._runs) else -1
+
+    def static_spans(self) -> List[Tuple[float, float]]:
+        """(start, end) intervals of two or more identical frames; the last
+        one is open-ended (end = inf)."""
+        spans = []
+        n = len(self._runs)
+        starts = np.flatnonzero(np.diff(self._runs, prepend=-1)) if n else np.zeros(0, dtype=np.int64)
+        for k, a in enumerate(starts):
+            b = starts[k + 1] if k + 1 < len(starts) else n
+            if b - a > 1:
+                spans.append((int(a) / self.fps, int(b) / self.fps))
+        spans.append((n / self.fps, float("inf")))
+        return spans
+
+    # ---- blitting ----
+    def _blit(self, buf: np.ndarray, layer: Layer, x: int, y: int, opacity: float) -> None:
+        w, h = layer.size
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + w), min(self.height, y + h)
+        if x0 >= x1 or y0 >= y1 or opacity <= 0.0:
+            return
+        sx, sy = x0 - x, y0 - y
+        src = layer.rgb[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+        dst = buf[y0:y1, x0:x1]
+        if layer.opaque and opacity >= 1.0:
+            dst[...] = src
+            return
+        if layer.opaque:
+            a = np.uint16(int(round(opacity * 255)))
+        else:
+            a = layer.alpha[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+            if opacity < 1.0:
+                a = (a * np.uint16(int(round(opacity * 256)))) >> 8
+        blended = (src.astype(np.uint16) * a + dst.astype(np.uint16) * (255 - a) + 127) // 255
+        dst[...] = blended.astype(np.uint8)
+
+    def render(self, t: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Composite the frame at time *t* (snapped to the frame grid) into
+        *out* (default: the shared buffer).
+
+        With the shared buffer, a frame identical to the one already held
+        (same run of the animation tracks) is returned without recompositing.
+        """
+        i = self.tracks.frame_index(t)
+        run = self._run_at(i)
+        if out is None:
+            if run == self._buf_run:
+                return self._buf
+            buf = self._buf
+            self._buf_run = run
+        else:
+            buf = out
+        np.copyto(buf, self.background)
+        if i < self.tracks.n_frames:
+            tr = self.tracks
+            for li in np.flatnonzero(tr.visible[:, i]):
+                layer = self.layers[li]
+                self._blit(buf, layer, int(tr.x[li, i]) + layer.offset[0], int(tr.y[li, i]) + layer.offset[1],
+                           float(tr.alpha[li, i]))
+        return buf
+
+    def frame_function(self):
+        """moviepy-compatible ``frame_function(t)``."""
+        return self.render
@@ -1,5 +1,7 @@
 import subprocess
 import os
+from canonicalAudio import is_canonical_aac
+from render_quality import get_tier, scaled, scaled_size, x264_args, aac_args
 
 def create9x16Video(input_video_path: str, output_path: str) -> str:
     """
@@ -25,6 +27,15 @@ def create9x16Video(input_video_path: str, output_path: str) -> str:
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
     
+    # Audio that is already AAC 48 kHz stereo is copied instead of re-encoded
+    if is_canonical_aac(input_video_path):
+        audio_args = ['-c:a', 'copy']
+    else:
+        audio_args = [*aac_args(), '-ar', '48000', '-ac', '2']
+
+    # 1080x1920 at the render tier's scale
+    out_w, out_h = scaled_size((1080, 1920))
+
     # ffmpeg command to create 9:16 video with blurred background
     cmd = [
         'ffmpeg',
@@ -32,20 +43,17 @@ def create9x16Video(input_video_path: str, output_path: str) -> str:
         '-i', input_video_path,  # Input video
         '-filter_complex', 
         # Create blurred background that fills 9:16 (1080x1920)
-        '[0:v]scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,gblur=sigma=50[bg];'
+        f'[0:v]scale={out_w}:{out_h}:force_original_aspect_ratio=increase,crop={out_w}:{out_h},gblur=sigma={scaled(50)}[bg];'
         # Scale original video to fit width while maintaining aspect ratio
-        '[0:v]scale=1080:-1[fg];'
+        f'[0:v]scale={out_w}:-2[fg];'
         # Overlay the original video centered on the blurred background
         '[bg][fg]overlay=(W-w)/2:(H-h)/2[v]',
         '-map', '[v]',
         '-map', '0:a?',  # Map audio if it exists
-        '-c:v', 'libx264',
+        *x264_args(),
         '-pix_fmt', 'yuv420p',
-        '-r', '30',
-        '-c:a', 'aac',
-        '-b:a', '192k',
-        '-ar', '48000',
-        '-ac', '2',
+        '-r', str(get_tier()["fps"]),
+        *audio_args,
         '-movflags', '+faststart',
         '-y',
         output_path
@@ -9,6 +9,8 @@ from dotenv import load_dotenv
 import hashlib
 import json
 import imghdr
+from atomic_io import atomic_write_json, valid_cache_entry
+from retry_policy import call_with_retry, backoff_delay, raise_for_status, RetryableError, EmptyResponseError, CircuitOpenError
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,7 +31,7 @@ def _cache_key(params: dict) -> str:
 def _load_cache(key: str) -> Optional[str]:
     """Load cached response text if available, otherwise *None*."""
     path = os.path.join(CACHE_DIR, f"{key}.json")
-    if not os.path.exists(path):
+    if not valid_cache_entry(path):
         return None
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -44,8 +46,7 @@ def _save_cache(key: str, params: dict, response: str) -> None:
     """Persist *response* (and *params* for debugging) to the cache."""
     path = os.path.join(CACHE_DIR, f"{key}.json")
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"params": params, "response": response, "timestamp": time.time()}, f, ensure_ascii=False, indent=2)
+        atomic_write_json(path, {"params": params, "response": response, "timestamp": time.time()}, ensure_ascii=False, indent=2)
     except Exception as e:
         print(f"Warning: failed to write cache {path}: {e}")
 
@@ -90,33 +91,31 @@ def ask_gemini(prompt: str, api_key: Optional[str] = None, model: str = "gemini-
         return _cached
     
     client = _get_client(api_key)
-    
-    for attempt in range(max_retries):
-        try:
-            response = client.models.generate_content(
-                model=model,
-                contents=prompt
-            )
-            
-            # Check if response is empty after trimming
-            response_text = response.text.strip() if response.text else ""
-            if response_text:
-                _save_cache(_cache_key_val, _cache_params, response_text)
-                return response_text
-            else:
-                print(f"Attempt {attempt + 1}/{max_retries}: Received empty response, retrying...")
-                if attempt < max_retries - 1:
-                    time.sleep(2)  # Wait 2 seconds before retrying
-                    
-        except Exception as e:
-            if attempt == max_retries - 1:  # Last attempt
-                raise Exception(f"Gemini API request failed: {str(e)}")
-            print(f"Attempt {attempt + 1}/{max_retries} failed: {str(e)}, retrying...")
-            time.sleep(2)
-    
-    # If we get here, all attempts returned empty responses
-    print(f"Warning: All {max_retries} attempts returned empty responses")
-    return ""
+
+    def _generate() -> str:
+        response = client.models.generate_content(
+            model=model,
+            contents=prompt
+        )
+        # Treat an empty response (after trimming) as retriable
+        response_text = response.text.strip() if response.text else ""
+        if not response_text:
+            raise EmptyResponseError("Received empty response")
+        return response_text
+
+    try:
+        response_text = call_with_retry("gemini", _generate, max_attempts=max_retries)
+    except RetryableError:
+        # All attempts returned empty responses
+        print(f"Warning: All {max_retries} attempts returned empty responses")
+        return ""
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise Exception(f"Gemini API request failed: {str(e)}")
+
+    _save_cache(_cache_key_val, _cache_params, response_text)
+    return response_text
 
 
 def wait_for_file_activation(client, file_name: str, max_wait_time: int = 300) -> bool:
@@ -132,7 +131,9 @@ def wait_for_file_activation(client, file_name: str, max_wait_time: int = 300) -
         True if file becomes active, False if timeout or failed
     """
     start_time = time.time()
+    poll = 0
     while time.time() - start_time < max_wait_time:
+        poll += 1
         try:
             file_info = client.files.get(name=file_name)
             if file_info.state == "ACTIVE":
@@ -146,10 +147,10 @@ def wait_for_file_activation(client, file_name: str, max_wait_time: int = 300) -
                     print(f"Warning: Failed to delete failed file {file_name}: {delete_error}")
                 return False
             print(f"Waiting for file {file_name} to activate... Current state: {file_info.state}")
-            time.sleep(5)  # Wait 5 seconds before checking again
         except Exception as e:
             print(f"Error checking file state: {e}")
-            time.sleep(5)
+        # Poll quickly at first, then back off (jittered) while processing drags on
+        time.sleep(backoff_delay("gemini_files", poll))
     
     return False
 
@@ -174,24 +175,18 @@ def ask_gemini_with_video(video_path: str, prompt: str, api_key: Optional[str] =
     
     def generate_content_with_retry(response_func):
         """Helper function to retry content generation if response is empty"""
-        for content_attempt in range(max_content_retries):
-            try:
-                response = response_func()
-                response_text = response.text.strip() if response.text else ""
-                if response_text:
-                    return response_text
-                else:
-                    print(f"Content attempt {content_attempt + 1}/{max_content_retries}: Received empty response, retrying...")
-                    if content_attempt < max_content_retries - 1:
-                        time.sleep(2)
-            except Exception as e:
-                if content_attempt == max_content_retries - 1:
-                    raise e
-                print(f"Content attempt {content_attempt + 1}/{max_content_retries} failed: {str(e)}, retrying...")
-                time.sleep(2)
-        
-        print(f"Warning: All {max_content_retries} content generation attempts returned empty responses")
-        return ""
+        def _generate() -> str:
+            response = response_func()
+            response_text = response.text.strip() if response.text else ""
+            if not response_text:
+                raise EmptyResponseError("Received empty response")
+            return response_text
+
+        try:
+            return call_with_retry("gemini", _generate, max_attempts=max_content_retries)
+        except RetryableError:
+            print(f"Warning: All {max_content_retries} content generation attempts returned empty responses")
+            return ""
     
     try:
         # Check file size to determine upload method
@@ -201,10 +196,9 @@ def ask_gemini_with_video(video_path: str, prompt: str, api_key: Optional[str] =
         # Use resumable upload with manual chunked streaming
         print("Using resumable file upload (chunked streaming)…")
 
-        for attempt in range(max_upload_retries):
+        def _upload_and_generate() -> str:
+            nonlocal uploaded_file
             try:
-                print(f"Upload attempt {attempt + 1}/{max_upload_retries}")
-
                 file_name = upload_file_resumable(video_path, api_key)
 
                 # Wait for file to become ACTIVE before we can use it
@@ -220,30 +214,27 @@ def ask_gemini_with_video(video_path: str, prompt: str, api_key: Optional[str] =
                         contents=[uploaded_file, prompt]
                     )
 
-                _vid_result = generate_content_with_retry(file_api_response)
-                _save_cache(_vid_cache_key, _vid_cache_params, _vid_result)
-                return _vid_result
-
-            except Exception as upload_error:
-                print(f"Upload attempt {attempt + 1} failed: {upload_error}")
-
+                return generate_content_with_retry(file_api_response)
+            except Exception:
                 # Best-effort cleanup (no need to fail if already deleted)
                 try:
                     if uploaded_file:
                         client.files.delete(name=uploaded_file.name)
                 except Exception:
                     pass
-
                 uploaded_file = None
+                raise
 
-                if attempt < max_upload_retries - 1:
-                    print("Retrying upload in 5 seconds…")
-                    time.sleep(5)
-                else:
-                    raise Exception(f"Failed to upload and activate file after {max_upload_retries} attempts: {upload_error}")
-        
-        # This should never be reached, but just in case
-        return ""
+        try:
+            _vid_result = call_with_retry("gemini_files", _upload_and_generate,
+                                          max_attempts=max_upload_retries, description="upload")
+        except CircuitOpenError:
+            raise
+        except Exception as upload_error:
+            raise Exception(f"Failed to upload and activate file after {max_upload_retries} attempts: {upload_error}")
+
+        _save_cache(_vid_cache_key, _vid_cache_params, _vid_result)
+        return _vid_result
         
     except Exception as e:
         raise Exception(f"Failed to analyze video {video_path}: {str(e)}")
@@ -341,23 +332,31 @@ def ask_gemini_with_images(image_paths: list[str], prompt: str, api_key: Optiona
     attempts.append(_build_contents([]))
 
     last_error: Optional[Exception] = None
+    circuit_open = False
     for attempt_contents in attempts:
-        for attempt in range(max_retries):
-            try:
-                response = client.models.generate_content(
-                    model=model,
-                    contents=attempt_contents,
-                )
-                response_text = response.text.strip() if response.text else ""
-                if response_text:
-                    _save_cache(_img_cache_key, _img_cache_params, response_text)
-                    return response_text
-                else:
-                    print(f"Attempt {attempt + 1}/{max_retries}: Received empty response, retrying…")
-            except Exception as e:
-                last_error = e
-                print(f"Attempt {attempt + 1}/{max_retries} failed: {str(e)}, retrying…")
-            time.sleep(2)
+        def _generate() -> str:
+            response = client.models.generate_content(
+                model=model,
+                contents=attempt_contents,
+            )
+            response_text = response.text.strip() if response.text else ""
+            if not response_text:
+                raise EmptyResponseError("Received empty response")
+            return response_text
+
+        try:
+            response_text = call_with_retry("gemini", _generate, max_attempts=max_retries)
+        except CircuitOpenError as e:
+            # Provider is down: every fallback would fail fast too
+            last_error = e
+            circuit_open = True
+            break
+        except Exception as e:
+            last_error = e
+            print(f"Image request failed after {max_retries} attempts: {str(e)}; trying next fallback…")
+            continue
+        _save_cache(_img_cache_key, _img_cache_params, response_text)
+        return response_text
 
     # If we reach here, all attempts failed or returned empty. Return a safe fallback JSON the caller can parse.
     print("Warning: Gemini image analysis failed after all fallbacks. Returning safe default selection.")
@@ -368,7 +367,9 @@ def ask_gemini_with_images(image_paths: list[str], prompt: str, api_key: Optiona
         "finalSelection": 1,
     }
     fallback_str = json.dumps(fallback)
-    _save_cache(_img_cache_key, _img_cache_params, fallback_str)
+    # Don't persist a fallback that only exists because the provider was unavailable
+    if not circuit_open:
+        _save_cache(_img_cache_key, _img_cache_params, fallback_str)
     return fallback_str
 
 
@@ -402,12 +403,17 @@ def upload_file_resumable(file_path: str, api_key: str, chunk_size: int = 5*8 *
         }
     }
 
-    init_resp = requests.post(
-        f"{SESSION_URL}?uploadType=resumable&key={api_key}",
-        headers=init_headers,
-        json=init_payload,
-        timeout=120,
-    )
+    def _init_session():
+        resp = requests.post(
+            f"{SESSION_URL}?uploadType=resumable&key={api_key}",
+            headers=init_headers,
+            json=init_payload,
+            timeout=120,
+        )
+        raise_for_status(resp, "Gemini upload session")
+        return resp
+
+    init_resp = call_with_retry("gemini_files", _init_session, description="init session")
 
     if init_resp.status_code not in {200, 201}:
         raise RuntimeError(f"Could not initiate upload session: {init_resp.text}")
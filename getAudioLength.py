@@ -1,5 +1,9 @@
 import subprocess
 import json
+import mimetypes
+from atomic_io import valid_cache_entry
+from canonicalAudio import getAudioMeta, canonical_path
+from pcm_cache import pcm_duration
 
 def getAudioLength(audio_path: str) -> float:
     """Get the length of an audio file in seconds using ffmpeg.
@@ -10,6 +14,20 @@ def getAudioLength(audio_path: str) -> float:
     Returns:
         Duration in seconds as a float
     """
+    # Canonical audio carries its duration in a sidecar; no need to probe
+    meta = getAudioMeta(audio_path)
+    if meta and meta.get("duration"):
+        return float(meta["duration"])
+
+    # Otherwise the decoded canonical PCM of an audio file, if there is one: its length is the duration
+    wav_path = canonical_path(audio_path)
+    is_audio = (mimetypes.guess_type(audio_path)[0] or "").startswith("audio/")
+    if is_audio and wav_path != audio_path and valid_cache_entry(wav_path):
+        try:
+            return pcm_duration(audio_path)
+        except Exception as e:
+            print(f"Warning: no canonical PCM duration for {audio_path} ({e}); probing instead")
+
     try:
         result = subprocess.run([
             'ffprobe', 
@@ -4,6 +4,8 @@ import requests
 import json
 from urllib.parse import quote_plus
 from pathlib import Path
+from atomic_io import atomic_write_bytes, is_temp_file
+from retry_policy import call_with_retry, raise_for_status
 
 load_dotenv()
 
@@ -43,7 +45,7 @@ def _download_images(search_query: str, num_images: int = 10) -> list[str]:
     
     # Check if folder already exists and has images
     if folder.exists():
-        existing_images = list(folder.glob("*"))
+        existing_images = [p for p in folder.glob("*") if not is_temp_file(str(p))]
         if existing_images:
             return [str(path) for path in existing_images]
     
@@ -57,16 +59,20 @@ def _download_images(search_query: str, num_images: int = 10) -> list[str]:
     }
 
     search_query = f"{search_query} -filetype:gif"
-    response = requests.post(
-        "https://google.serper.dev/images",
-        headers=headers,
-        json={"q": search_query,"num": num_images, 
-        # "tbs": "isz:lt,islt:xga",
-        },
-        timeout=30,
-    )
-    response.raise_for_status()
-    data = response.json()
+
+    def _search():
+        resp = requests.post(
+            "https://google.serper.dev/images",
+            headers=headers,
+            json={"q": search_query,"num": num_images, 
+            # "tbs": "isz:lt,islt:xga",
+            },
+            timeout=30,
+        )
+        raise_for_status(resp, "Serper")
+        return resp.json()
+
+    data = call_with_retry("serper", _search, description=repr(search_query[:40]))
 
     results = data.get("images") or data.get("results") or data.get("items") or []
 
@@ -83,15 +89,19 @@ def _download_images(search_query: str, num_images: int = 10) -> list[str]:
         if not url:
             continue
 
+        def _fetch(url=url):
+            resp = requests.get(url, timeout=20)
+            raise_for_status(resp, "image host")
+            return resp
+
         try:
-            img_resp = requests.get(url, timeout=20)
+            img_resp = call_with_retry("image_download", _fetch)
             if img_resp.status_code != 200:
                 continue
 
             ext = ".png" if url.lower().endswith(".png") else ".jpg"
             file_path = folder / f"{idx}{ext}"
-            with open(file_path, "wb") as f:
-                f.write(img_resp.content)
+            atomic_write_bytes(str(file_path), img_resp.content)
             image_paths.append(str(file_path))
         except Exception:
             continue
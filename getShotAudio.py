@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import wave
+from typing import List, Dict, Any
+
+from getTTS import getTTS
+from getTimestamps import getWords, _norm, _PhraseMatcher, _Word
+from tts_alignment import load_alignment
+from atomic_io import atomic_path, atomic_write_json, valid_cache_entry
+from canonicalAudio import getCanonicalAudio, write_wav_meta, CANONICAL_SAMPLE_RATE, CANONICAL_CHANNELS
+
+CACHE_DIR = "cache/shotaudio"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# How many leading words of a shot's VO are used to locate it in the transcript
+BOUNDARY_PHRASE_WORDS = 5
+
+
+def _cache_dir(tts_path: str) -> str:
+    key_src = f"{os.path.abspath(tts_path)}|{CANONICAL_SAMPLE_RATE}|{CANONICAL_CHANNELS}|{BOUNDARY_PHRASE_WORDS}".encode("utf-8")
+    return os.path.join(CACHE_DIR, hashlib.md5(key_src).hexdigest())
+
+
+def _shot_boundaries(vos: List[str], words) -> List[int]:
+    """Return the transcript word index at which each shot's VO starts."""
+    norm_words = [_norm(w.word) for w in words]
+    matcher = _PhraseMatcher(norm_words)
+    total_chars = max(1, sum(len(v) for v in vos))
+    starts = [0]
+    chars_before = 0
+    for k in range(1, len(vos)):
+        chars_before += len(vos[k - 1])
+        lead = _norm(vos[k]).split()[:BOUNDARY_PHRASE_WORDS]
+        idx, _len, score = matcher.match(lead, start_idx=starts[-1] + 1) if lead else (None, None, 0.0)
+        if idx is None or score < 0.5:
+            # Fall back to a proportional estimate by script length
+            idx = int(round(len(words) * chars_before / total_chars))
+            print(f"ShotAudio: weak boundary match for shot {k} (score {score:.2f}); estimating")
+        starts.append(min(max(starts[-1] + 1, idx), len(words) - 1))
+    return starts
+
+
+def getShotAudio(vos: List[str], voice: str = "Liam") -> List[Dict[str, Any]]:
+    """Synthesize the whole VO (all shots' *vos* joined) in one TTS request,
+    transcribe it once and split it into per-shot WAV files at the shot
+    boundaries.
+
+    Cuts are made in the silence between the last word of one shot and the
+    first word of the next, at exact sample positions of a single PCM decode
+    (no lossy re-encode of the pieces).
+
+    Returns one dict per shot: {"path": wav_path, "words": [{"word", "start", "end"}, ...]}
+    with word times relative to the start of that shot's audio.
+    """
+    vos = [v.strip() for v in vos]
+    if not vos or not all(vos):
+        raise ValueError("getShotAudio: every shot needs a non-empty vo.")
+
+    full_tts = getTTS(" ".join(vos), voice=voice)
+
+    out_dir = _cache_dir(full_tts)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if valid_cache_entry(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if len(manifest) == len(vos) and all(valid_cache_entry(m["path"]) for m in manifest):
+                print(f"ShotAudio: Using cached split: {out_dir}")
+                return manifest
+        except Exception as e:
+            print(f"Warning: failed to read shot audio manifest {manifest_path}: {e}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    # The TTS cache already holds the whole VO as canonical PCM; cut that directly
+    full_wav = getCanonicalAudio(full_tts)
+    provider_words = load_alignment(full_tts)
+    if provider_words:
+        words = [_Word(w["word"], w["start"], w["end"]) for w in provider_words]
+    else:
+        words = getWords(full_wav)
+    starts = _shot_boundaries(vos, words)
+
+    with wave.open(full_wav, "rb") as src:
+        sr = src.getframerate()
+        n_frames = src.getnframes()
+        params = src.getparams()
+
+        # Cut points (in samples): midway through the gap between shots
+        cuts = [0]
+        for k in range(1, len(vos)):
+            prev_end = float(words[starts[k] - 1].end)
+            next_start = float(words[starts[k]].start)
+            cut_t = (prev_end + next_start) / 2.0 if next_start >= prev_end else next_start
+            cuts.append(max(cuts[-1], min(n_frames, int(round(cut_t * sr)))))
+        cuts.append(n_frames)
+
+        manifest = []
+        for k in range(len(vos)):
+            a, b = cuts[k], cuts[k + 1]
+            shot_path = os.path.join(out_dir, f"{k:03d}.wav")
+            src.setpos(a)
+            data = src.readframes(b - a)
+            with atomic_path(shot_path) as tmp_path:
+                with wave.open(tmp_path, "wb") as dst:
+                    dst.setparams(params)
+                    dst.writeframes(data)
+            write_wav_meta(shot_path)
+
+            offset = a / float(sr)
+            end_idx = starts[k + 1] if k + 1 < len(vos) else len(words)
+            shot_words = [
+                {
+                    "word": w.word,
+                    "start": max(0.0, float(w.start) - offset),
+                    "end": max(0.0, float(w.end) - offset),
+                }
+                for w in words[starts[k]:end_idx]
+            ]
+            manifest.append({"path": shot_path, "words": shot_words})
+
+    atomic_write_json(manifest_path, manifest, ensure_ascii=False, indent=2)
+    return manifest
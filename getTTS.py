@@ -102,10 +102,17 @@
 
 import os, hashlib
 from gradio_client import Client
+from retry_policy import call_with_retry, raise_for_status
+from canonicalAudio import getCanonicalAudio
+from atomic_io import atomic_write_bytes, valid_cache_entry
+from tts_alignment import save_alignment
 
 CACHE_DIR = "cache/tts"
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+# Ask the provider for character timestamps and keep them next to the mp3 (tts_alignment)
+TTS_REQUEST_TIMESTAMPS = os.getenv("TTS_REQUEST_TIMESTAMPS", "1") == "1"
+
 def _append_log(message: str) -> None:
     """Append a timestamped log line to log.txt in project root."""
     from datetime import datetime
@@ -117,34 +124,73 @@ def _append_log(message: str) -> None:
         pass
 
 
+def _ensure_canonical(mp3_path: str) -> None:
+    """Store the 48 kHz stereo PCM derivative (+ duration/loudness) next to the mp3
+    once, so downstream stages never decode and resample the mp3 again."""
+    try:
+        getCanonicalAudio(mp3_path)
+    except Exception as e:
+        print(f"Warning: failed to create canonical audio for {mp3_path}: {e}")
+
+
+def _key_path(key_src):
+    return os.path.join(CACHE_DIR, hashlib.md5(key_src.encode("utf-8")).hexdigest() + ".mp3")
+
+
+def _cache_path(text, voice="Liam", previous_text=None):
+    # Text is stripped exactly as getTTS strips it before keying, so callers
+    # holding unstripped text (prefetchTTS) agree with getTTS; with provider
+    # timestamps on, audio lives under its own key next to its alignment
+    key_src = f"{voice}|{previous_text or ''}|{text.strip()}"
+    if TTS_REQUEST_TIMESTAMPS:
+        key_src += "|timestamps"
+    return _key_path(key_src)
+
+
+def cached_tts_path(text, voice="Liam", previous_text=None):
+    """Path of cached audio for this utterance, or None.
+
+    Besides the current key, entries written before the timestamps flag was
+    part of the key are reused (keyed on the text as given and stripped),
+    with or without a stored alignment: without one, word timings come from
+    forced alignment or transcription instead.
+    """
+    path = _cache_path(text, voice=voice, previous_text=previous_text)
+    if valid_cache_entry(path):
+        return path
+    for key_text in dict.fromkeys((text, text.strip())):
+        legacy = _key_path(f"{voice}|{previous_text or ''}|{key_text}")
+        if valid_cache_entry(legacy):
+            return legacy
+    return None
+
+
 def getTTS(text, voice="Liam", previous_text=None):
     import requests
     import json
-    import time
     from dotenv import load_dotenv
     
     load_dotenv()
     
+    raw_text = text
     text = text.strip()
     if not text:
         raise ValueError("getTTS: text is empty.")
 
     print(f"TTS: Processing text: {text[:80]!r}...")
 
-    # Update cache path for new parameters
-    key_src = f"{voice}|{previous_text or ''}|{text}".encode("utf-8")
-    cache_path = os.path.join(CACHE_DIR, hashlib.md5(key_src).hexdigest() + ".mp3")
-    
-    if os.path.exists(cache_path):
-        print(f"TTS: Using cached audio: {cache_path}")
-        return cache_path
+    cached = cached_tts_path(raw_text, voice=voice, previous_text=previous_text)
+    if cached:
+        print(f"TTS: Using cached audio: {cached}")
+        _ensure_canonical(cached)
+        return cached
+    cache_path = _cache_path(text, voice=voice, previous_text=previous_text)
 
-    # Primary (and only): ElevenLabs via FAL with retries (3)
+    # Primary (and only): ElevenLabs via FAL under the shared retry policy
     api_key = os.getenv('FAL_KEY')
     if not api_key:
         _append_log("TTS: FAL_KEY not set; cannot proceed")
-        import sys
-        sys.exit(1)
+        raise RuntimeError("getTTS: FAL_KEY environment variable not set.")
 
     url = "https://fal.run/fal-ai/elevenlabs/tts/turbo-v2.5"
     headers = {
@@ -159,44 +205,39 @@ def getTTS(text, voice="Liam", previous_text=None):
     }
     if previous_text:
         payload["previous_text"] = previous_text
+    if TTS_REQUEST_TIMESTAMPS:
+        payload["timestamps"] = True
 
-    max_retries = 3
-    last_error_msg = None
-    for attempt in range(max_retries):
+    def _attempt():
         try:
             response = requests.post(url, headers=headers, json=payload, timeout=60)
-            status = response.status_code
-            if status >= 400:
-                # Log body on errors for visibility
-                body = None
+            # Classifies 429/5xx as retriable (honouring Retry-After), other 4xx as fatal
+            raise_for_status(response, "FAL")
+            result = response.json()
+            audio_url = result.get("audio", {}).get("url")
+            if not audio_url:
+                raise RuntimeError("No audio URL returned from API")
+            # Download audio with timeout
+            audio_response = requests.get(audio_url, timeout=60)
+            raise_for_status(audio_response, "FAL audio download")
+            # Audio first, so an interrupted write never leaves an alignment without audio
+            atomic_write_bytes(cache_path, audio_response.content)
+            if TTS_REQUEST_TIMESTAMPS:
                 try:
-                    body = response.text[:1000]
-                except Exception:
-                    body = "<failed to read body>"
-                last_error_msg = f"HTTP {status} from FAL; body: {body}"
-                _append_log(f"TTS: attempt {attempt+1}/{max_retries} failed — {last_error_msg}")
-                # Do not raise_for_status yet; continue retry loop
-            else:
-                result = response.json()
-                audio_url = result.get("audio", {}).get("url")
-                if not audio_url:
-                    last_error_msg = "No audio URL returned from API"
-                    _append_log(f"TTS: attempt {attempt+1}/{max_retries} failed — {last_error_msg}")
-                else:
-                    # Download audio with timeout
-                    audio_response = requests.get(audio_url, timeout=60)
-                    audio_response.raise_for_status()
-                    with open(cache_path, "wb") as f:
-                        f.write(audio_response.content)
-                    return cache_path
+                    if not save_alignment(cache_path, result):
+                        print("TTS: provider returned no alignment")
+                except Exception as e:
+                    print(f"Warning: failed to store TTS alignment: {e}")
+            _ensure_canonical(cache_path)
+            return cache_path
         except Exception as e:
-            last_error_msg = str(e)
-            _append_log(f"TTS: attempt {attempt+1}/{max_retries} exception — {last_error_msg}")
-        # Small delay between attempts
-        time.sleep(2)
-
-    # All retries failed — log context and exit program
-    snippet = text[:200].replace("\n", " ")
-    _append_log(f"TTS: all retries failed; voice={voice}, prev_len={(len(previous_text) if previous_text else 0)}, text_len={len(text)}, text_snippet={snippet!r}, error={last_error_msg}")
-    import sys
-    sys.exit(1)
+            _append_log(f"TTS: attempt failed — {e}")
+            raise
+
+    try:
+        return call_with_retry("fal_tts", _attempt, description=repr(text[:40]))
+    except Exception as e:
+        # All retries failed (or the provider circuit is open) — log context and surface the error
+        snippet = text[:200].replace("\n", " ")
+        _append_log(f"TTS: all retries failed; voice={voice}, prev_len={(len(previous_text) if previous_text else 0)}, text_len={len(text)}, text_snippet={snippet!r}, error={e}")
+        raise RuntimeError(f"getTTS failed for {snippet[:80]!r}: {e}") from e
@@ -1,18 +1,29 @@
 import os
+import re
 import hashlib
 import json
+from collections import defaultdict
+from whisper_models import get_whisper_model, load_whisper_config
+from atomic_io import atomic_write_json, valid_cache_entry
+from transcription import transcribe_words, audio_hash
+from tts_alignment import load_alignment
 
 CACHE_DIR = "cache/whisper"
 os.makedirs(CACHE_DIR, exist_ok=True)
 
-def _cache_path(tts_path):
-    """Generate cache path for whisper results based on audio file path."""
-    key_src = f"{tts_path}".encode("utf-8")
+# Forced alignment runs on a single Whisper window; longer audio falls back to ASR
+ALIGN_MAX_SECONDS = 30.0
+# Whisper's cross-attention alignment resolution (20 ms per step)
+ALIGN_TOKENS_PER_SECOND = 50
+
+def _cache_path(key):
+    """Generate cache path for whisper (alignment) results from a key string."""
+    key_src = f"{key}".encode("utf-8")
     return os.path.join(CACHE_DIR, hashlib.md5(key_src).hexdigest() + ".json")
 
 def _load_whisper_cache(cache_path):
     """Load cached whisper results if available."""
-    if not os.path.exists(cache_path):
+    if not valid_cache_entry(cache_path):
         return None
     try:
         with open(cache_path, "r", encoding="utf-8") as f:
@@ -34,117 +45,294 @@ def _save_whisper_cache(cache_path, words):
                 "end": word.end
             })
         
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump({"words": words_data}, f, ensure_ascii=False, indent=2)
+        atomic_write_json(cache_path, {"words": words_data}, ensure_ascii=False, indent=2)
     except Exception as e:
         print(f"Warning: failed to write whisper cache {cache_path}: {e}")
 
-def getMediaTimestamps(media, tts_path):
-    """Given the media plan (list of dicts) and an audio file path, return the same
-    list but with `startTimestamp` and `endTimestamp` (seconds) filled in for each
-    entry.
+class _Word:
+    """Minimal stand-in for faster-whisper's Word (.word, .start, .end)."""
+    def __init__(self, word, start, end):
+        self.word = word
+        self.start = start
+        self.end = end
 
-    The audio is transcribed at *word* level using the *small* faster-whisper
-    model. For every object we look for an approximate match (fuzzy) of
-    `triggerPhrase` and `endPhrase` in the transcript and record the timestamps
-    at the beginning of the first matched word and at the end of the last matched
-    word respectively.
-    """
-    from pathlib import Path
-    import re, difflib, math
 
-    try:
-        from faster_whisper import WhisperModel
-    except ImportError as e:
-        raise ImportError(
-            "faster_whisper is required for getMediaTimestamps. Install with 'pip install faster-whisper'"
-        ) from e
+def getWords(tts_path):
+    """Transcribe *tts_path* at word level (cached) and return a list of words
+    each having .word, .start and .end (seconds)."""
+    from pathlib import Path
 
     audio_path = Path(tts_path).resolve()  # Use absolute path
     if not audio_path.exists():
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
 
-    # Check cache first
-    cache_path = _cache_path(str(audio_path))
+    # Content-addressed cache shared with captions (small is ~500MB and reasonably fast)
+    cfg = load_whisper_config()
+    words = transcribe_words(str(audio_path), cfg["model"], "cpu", cfg["compute_type"],
+                             beam_size=cfg["beam_size"], cpu_threads=cfg["cpu_threads"])
+    if not words:
+        raise RuntimeError("No words were produced by the speech recogniser.")
+    return [_Word(w["word"], w["start"], w["end"]) for w in words]
+
+
+def alignWords(tts_path, script):
+    """Force-align the known *script* to *tts_path* and return word objects
+    (.word, .start, .end) — one per whitespace-separated script word.
+
+    Instead of open-vocabulary beam search, the script's tokens are fed to the
+    Whisper decoder as-is and word times are read off the cross-attention
+    alignment (the same mechanism faster-whisper uses for word_timestamps).
+    Words therefore match the script exactly. Results are cached alongside
+    the transcription cache.
+    """
+    from pathlib import Path
+
+    audio_path = Path(tts_path).resolve()
+    if not audio_path.exists():
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    script_words = str(script).split()
+    if not script_words:
+        raise ValueError("alignWords: script is empty.")
+
+    script_hash = hashlib.md5(" ".join(script_words).encode("utf-8")).hexdigest()
+    cache_path = _cache_path(f"{audio_hash(str(audio_path))}|align|{script_hash}")
     cached_words = _load_whisper_cache(cache_path)
-    
     if cached_words:
-        print(f"Whisper: Using cached results for {audio_path.name}")
-        # Convert cached data back to objects with attributes
-        class Word:
-            def __init__(self, word, start, end):
-                self.word = word
-                self.start = start
-                self.end = end
-        
-        words = [Word(w["word"], w["start"], w["end"]) for w in cached_words]
-    else:
-        print(f"Whisper: Processing audio file: {audio_path.name}")
-        
-        # Load model (small is ~500MB and reasonably fast)
-        model = WhisperModel("small", device="cpu", compute_type="int8")
+        print(f"Whisper: Using cached alignment for {audio_path.name}")
+        return [_Word(w["word"], w["start"], w["end"]) for w in cached_words]
 
-        # Transcribe and collect words across segments
-        words = []  # list of Word objects each having .word, .start, .end
+    import numpy as np
+    from faster_whisper.tokenizer import Tokenizer
+    from pcm_cache import get_asr_pcm, ASR_SAMPLE_RATE
 
-        # faster-whisper's transcribe returns (segments_generator, info)
-        segments, _ = model.transcribe(str(audio_path), word_timestamps=True)
+    cfg = load_whisper_config()
+    model = get_whisper_model(cfg["model"], "cpu", cfg["compute_type"], cfg["cpu_threads"])
+    extractor = model.feature_extractor
+    if extractor.sampling_rate != ASR_SAMPLE_RATE:
+        raise ValueError(f"alignWords: model expects {extractor.sampling_rate} Hz audio")
+    audio = np.asarray(get_asr_pcm(str(audio_path)))
+    if len(audio) > ALIGN_MAX_SECONDS * extractor.sampling_rate:
+        raise ValueError(f"alignWords: audio longer than {ALIGN_MAX_SECONDS:.0f}s")
 
-        for segment in segments:
-            # Each segment has a .words attribute which is a list of Word objects
-            if not segment.words:
-                continue
-            words.extend(segment.words)
+    print(f"Whisper: Aligning script to {audio_path.name}")
+    features = extractor(audio)
+    num_frames = min(features.shape[-1], extractor.nb_max_frames)
+    features = features[:, :extractor.nb_max_frames]
+    if features.shape[-1] < extractor.nb_max_frames:
+        features = np.pad(features, ((0, 0), (0, extractor.nb_max_frames - features.shape[-1])))
+    encoder_output = model.encode(features)
 
-        if not words:
-            raise RuntimeError("No words were produced by the speech recogniser.")
-        
-        # Save to cache
-        _save_whisper_cache(cache_path, words)
+    tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language="en")
+    text_tokens = []
+    spans = []  # (first_token, end_token) per script word
+    for w in script_words:
+        toks = tokenizer.encode(" " + w)
+        spans.append((len(text_tokens), len(text_tokens) + len(toks)))
+        text_tokens.extend(toks)
 
-    # Normalisation helpers -------------------------------------------------
-    _punct = re.compile(r"[^a-z0-9 ]", re.IGNORECASE)
+    result = model.model.align(encoder_output, tokenizer.sot_sequence, [text_tokens], num_frames)[0]
+    text_indices = np.array([pair[0] for pair in result.alignments])
+    time_indices = np.array([pair[1] for pair in result.alignments])
+    if len(text_indices) == 0:
+        raise RuntimeError("alignWords: empty alignment")
+    # Time at which each token (plus the final end-of-text) starts
+    jumps = np.pad(np.diff(text_indices), (1, 0), constant_values=1).astype(bool)
+    jump_times = time_indices[jumps] / float(ALIGN_TOKENS_PER_SECOND)
+    last = len(jump_times) - 1
 
-    def _norm(s: str) -> str:
-        s = s.lower()
-        s = _punct.sub(" ", s)
-        s = re.sub(r"\s+", " ", s).strip()
-        return s
+    words = [
+        _Word(" " + w, float(jump_times[min(a, last)]), float(jump_times[min(b, last)]))
+        for w, (a, b) in zip(script_words, spans)
+    ]
+    _save_whisper_cache(cache_path, words)
+    return words
 
-    # Prepare transcript word list once for quick lookups
-    norm_transcript_words = [_norm(w.word) for w in words]
 
-    # Build helper for fuzzy matching ---------------------------------------
-    def _best_window_match(phrase_words: list[str], start_idx: int = 0):
-        """Return (best_start_index, score) for best fuzzy match of phrase_words
-        in transcript starting from start_idx.
-        """
-        target_str = " ".join(phrase_words)
-        best_score = 0.0
-        best_i = None
+# Normalisation helpers -----------------------------------------------------
+_punct = re.compile(r"[^a-z0-9 ]", re.IGNORECASE)
+
+def _norm(s: str) -> str:
+    s = s.lower()
+    s = _punct.sub(" ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def _exact_match(norm_transcript_words: list[str], phrase_words: list[str], start_idx: int = 0):
+    """Return (start_index, window_len) of the first exact occurrence of
+    phrase_words at or after start_idx, or (None, None).
+
+    A transcript word may normalise to several tokens ("well-known"), so the
+    comparison runs on the flattened token sequence.
+    """
+    if not phrase_words:
+        return None, None
+    flat = []  # (token, transcript word index)
+    for idx in range(start_idx, len(norm_transcript_words)):
+        flat.extend((tok, idx) for tok in norm_transcript_words[idx].split())
+    tokens = [t for t, _ in flat]
+    pl = len(phrase_words)
+    for i in range(len(tokens) - pl + 1):
+        if tokens[i:i + pl] == phrase_words:
+            first, last = flat[i][1], flat[i + pl - 1][1]
+            return first, last - first + 1
+    return None, None
+
+
+def _banded_similarity(a: str, b: str, band: int, min_score: float = 0.0) -> float:
+    """1 - normalised Levenshtein distance of *a* and *b*, computing only the
+    DP cells within *band* of the diagonal. Distances beyond the band are
+    over-estimated, which only matters for matches that are poor anyway.
+    Returns 0.0 early once the score cannot exceed *min_score*."""
+    la, lb = len(a), len(b)
+    if la == 0 or lb == 0:
+        return 1.0 if la == lb else 0.0
+    longest = float(max(la, lb))
+    if 1.0 - abs(la - lb) / longest <= min_score:
+        return 0.0
+    max_dist = (1.0 - min_score) * longest
+    band = max(band, abs(la - lb))
+    inf = la + lb
+    prev = [j if j <= band else inf for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        cur = [inf] * (lb + 1)
+        lo, hi = max(1, i - band), min(lb, i + band)
+        if i <= band:
+            cur[0] = i
+        ai = a[i - 1]
+        for j in range(lo, hi + 1):
+            d = prev[j - 1] + (ai != b[j - 1])
+            if prev[j] < d:
+                d = prev[j] + 1 if prev[j] + 1 < d else d
+            if cur[j - 1] + 1 < d:
+                d = cur[j - 1] + 1
+            cur[j] = d
+        # Every cell outside [lo, hi] is inf or cur[0]; stop once nothing can beat min_score
+        if min(cur[0], min(cur[lo:hi + 1], default=inf)) >= max_dist:
+            return 0.0
+        prev = cur
+    return max(0.0, 1.0 - prev[lb] / longest)
+
+
+def _trigrams(word: str) -> set:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _PhraseMatcher:
+    """Inverted index over a normalised transcript for fast fuzzy phrase lookup.
+
+    Every phrase word votes for the transcript offsets where the phrase would
+    have to start for that word to line up (exact word hits count fully,
+    words sharing most character trigrams count half). Only the best-voted
+    offsets are scored, with a banded edit distance, instead of every window
+    of the transcript. Phrases with no votes at all have no match.
+    """
+
+    SHORTLIST = 6
+
+    def __init__(self, norm_transcript_words: list[str]):
+        self.words = norm_transcript_words
+        self.word_index = defaultdict(list)
+        self.gram_index = defaultdict(set)
+        for i, w in enumerate(norm_transcript_words):
+            for tok in w.split():
+                self.word_index[tok].append(i)
+            for g in _trigrams(w):
+                self.gram_index[g].add(i)
+
+    def _votes(self, phrase_words: list[str], start_idx: int) -> dict:
+        votes = defaultdict(float)
+        for k, pw in enumerate(phrase_words):
+            hits = self.word_index.get(pw)
+            if hits:
+                for p in hits:
+                    if p - k >= start_idx:
+                        votes[p - k] += 1.0
+                continue
+            grams = _trigrams(pw)
+            shared = defaultdict(int)
+            for g in grams:
+                for p in self.gram_index.get(g, ()):
+                    shared[p] += 1
+            for p, n in shared.items():
+                if n * 2 >= len(grams) and p - k >= start_idx:
+                    votes[p - k] += 0.5
+        return votes
+
+    def match(self, phrase_words: list[str], start_idx: int = 0):
+        """Best fuzzy match of *phrase_words* starting at or after *start_idx*:
+        (start_index, window_len, score), or (None, None, 0.0) if none."""
         pl = len(phrase_words)
-        # Allow window length ±2 to account for extra/missing words
-        for win_len in range(max(1, pl - 2), pl + 3):
-            for i in range(start_idx, len(norm_transcript_words) - win_len + 1):
-                window = norm_transcript_words[i : i + win_len]
-                cand_str = " ".join(window)
-                score = difflib.SequenceMatcher(None, target_str, cand_str).ratio()
-                if score > best_score:
-                    best_score = score
-                    best_i = (i, win_len)
-                # Early exit if perfect match
-                if best_score == 1.0:
-                    return best_i[0], best_i[1], best_score
-        if best_i is None:
+        if pl == 0:
+            return None, None, 0.0
+        votes = self._votes(phrase_words, start_idx)
+        if not votes:
+            # No transcript word resembles any phrase word: nothing to score
             return None, None, 0.0
-        return best_i[0], best_i[1], best_score
+
+        target = " ".join(phrase_words)
+        band = max(3, len(target) // 4)
+        shortlist = sorted(votes, key=lambda o: (-votes[o], o))[: self.SHORTLIST]
+        best = (None, None, 0.0)
+        seen = set()
+        for offset in shortlist:
+            # Extra/missing words shift the true start by a word or two
+            for i in range(max(start_idx, offset - 2), offset + 3):
+                for win_len in range(max(1, pl - 2), pl + 3):
+                    if (i, win_len) in seen or i + win_len > len(self.words):
+                        continue
+                    seen.add((i, win_len))
+                    score = _banded_similarity(target, " ".join(self.words[i:i + win_len]), band, best[2])
+                    if score > best[2] or (score == best[2] and best[0] is not None and i < best[0]):
+                        best = (i, win_len, score)
+                    if score == 1.0:
+                        return best
+        return best
+
+
+def getMediaTimestamps(media, tts_path, words=None):
+    """Given the media plan (list of dicts) and an audio file path, return the same
+    list but with `startTimestamp` and `endTimestamp` (seconds) filled in for each
+    entry.
+
+    The audio is transcribed at *word* level using the *small* faster-whisper
+    model. For every object we look for an approximate match (fuzzy) of
+    `triggerPhrase` and `endPhrase` in the transcript and record the timestamps
+    at the beginning of the first matched word and at the end of the last matched
+    word respectively.
+
+    If *words* (objects with .word/.start/.end, or dicts with those keys) are
+    given they are used as the transcript and no transcription is run.
+    """
+    if words is None:
+        words = getWords(tts_path)
+    else:
+        words = [_Word(w["word"], w["start"], w["end"]) if isinstance(w, dict) else w for w in words]
+
+    # Prepare transcript word list and its index once for quick lookups
+    norm_transcript_words = [_norm(w.word) for w in words]
+    matcher = _PhraseMatcher(norm_transcript_words)
+    # Media usually appears in script order: look after the previous trigger first
+    hint = 0
 
     # Iterate media objects and fill timestamps -----------------------------
     for item in media:
         trig_words = _norm(item["triggerPhrase"]).split()
         end_words = _norm(item["endPhrase"]).split()
 
-        trig_start, trig_len, trig_score = _best_window_match(trig_words)
+        # Exact hits are the norm for force-aligned transcripts; fuzzy search is the fallback
+        trig_start, trig_len = _exact_match(norm_transcript_words, trig_words, start_idx=hint)
+        if trig_start is None and hint:
+            trig_start, trig_len = _exact_match(norm_transcript_words, trig_words)
+        trig_score = 1.0
+        if trig_start is None:
+            trig_start, trig_len, trig_score = matcher.match(trig_words, start_idx=hint)
+            if hint:
+                # Out-of-order media: accept an earlier match if it is clearly better
+                g_start, g_len, g_score = matcher.match(trig_words)
+                if g_start is not None and g_score > trig_score + 0.1:
+                    trig_start, trig_len, trig_score = g_start, g_len, g_score
         if trig_start is None:
             # Could not find; skip
             item["startTimestamp"] = None
@@ -153,7 +341,12 @@ def getMediaTimestamps(media, tts_path):
 
         # End search begins after trigger start to ensure order
         end_search_start = trig_start + trig_len
-        end_start, end_len, end_score = _best_window_match(end_words, start_idx=end_search_start)
+        end_start, end_len = _exact_match(norm_transcript_words, end_words, start_idx=end_search_start)
+        end_score = 1.0
+        if end_start is None:
+            end_start, end_len, end_score = matcher.match(end_words, start_idx=end_search_start)
+
+        hint = trig_start
 
         # Compute timestamps
         start_ts = words[trig_start].start  # type: ignore[attr-defined]
@@ -170,16 +363,28 @@ def getMediaTimestamps(media, tts_path):
     return media
 
 
-def get_phrase_timestamps(phrases: list[str], tts_path: str) -> dict[str, float]:
+def get_phrase_timestamps(phrases: list[str], tts_path: str, words=None, script=None) -> dict[str, float]:
     """
     Convenience wrapper around getMediaTimestamps for a simpler use-case:
     Given a list of phrases and the path to the corresponding audio, return a
     mapping {phrase: start_timestamp_seconds}.
+
+    Word times come from, in order of preference: *words* if given, the TTS
+    provider's stored alignment, forced alignment of the known *script*, and
+    finally transcription.
     """
     if not phrases:
         return {}
 
+    if words is None:
+        words = load_alignment(tts_path)
+    if words is None and script:
+        try:
+            words = alignWords(tts_path, script)
+        except Exception as e:
+            print(f"Warning: forced alignment failed ({e}); falling back to transcription")
+
     # Re-use the existing implementation by constructing a minimal media plan
     media_plan = [{"triggerPhrase": p, "endPhrase": ""} for p in phrases]
-    results = getMediaTimestamps(media_plan, tts_path)
-    return {item["triggerPhrase"]: item.get("startTimestamp") for item in results}
\ No newline at end of file
+    results = getMediaTimestamps(media_plan, tts_path, words=words)
+    return {item["triggerPhrase"]: item.get("startTimestamp") for item in results}
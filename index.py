@@ -1,5 +1,7 @@
 from runit import runit
 from upload_video import get_authenticated_service
 
-runit("profiles/naturelist")
-runit("profiles/govlist")
\ No newline at end of file
+# Guarded: render shard workers start fresh interpreters that re-import this module
+if __name__ == "__main__":
+    runit("profiles/naturelist")
+    runit("profiles/govlist")
@@ -10,6 +10,9 @@ import math
 from getTTS import getTTS
 from getAudioLength import getAudioLength
 from overlayAudioVideo import overlayAudioVideo
+from canonicalAudio import getCanonicalAudio
+from render_quality import get_tier, scaled_size, moviepy_kwargs
+from background_plate import get_background_plate
 
 # ---------------------- constants ----------------------
 MAX_IDEA_SIZE = 300  # Maximum diameter for each idea circle
@@ -21,18 +24,6 @@ MAX_FONT_SIZE = 48   # Maximum font size for labels
 
 # ---------------------- helpers ----------------------
 
-def _cover_fit(bg: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
-    """Resize+crop a background to cover target_size (like CSS background-size: cover)."""
-    tw, th = target_size
-    bw, bh = bg.size
-    scale = max(tw / bw, th / bh)
-    new_size = (int(bw * scale), int(bh * scale))
-    bg = bg.resize(new_size, Image.LANCZOS)
-    # center crop
-    left = (bg.width - tw) // 2
-    top = (bg.height - th) // 2
-    return bg.crop((left, top, left + tw, top + th))
-
 def _load_font(preferred: str, size: int, font_path: str = "font.ttf") -> ImageFont.FreeTypeFont:
     """Try a few common fonts; fall back gracefully."""
     candidates = [
@@ -291,8 +282,8 @@ def makeAllIdeasImage(items: List[Dict[str, str]],
 
     # Background
     if os.path.exists(background_path):
-        bg = Image.open(background_path).convert("RGB")
-        canvas = _cover_fit(bg, (W, H)).convert("RGBA")
+        # Cover-fitted once per (background, size) and shared with buildShot
+        canvas = Image.fromarray(np.asarray(get_background_plate(background_path, (W, H))), "RGB").convert("RGBA")
     else:
         # tasteful fallback gradient
         grad = Image.new("L", (1, H), color=0)
@@ -446,16 +437,20 @@ def zoomintoidea(items: List[Dict[str, str]],
         raise ValueError(f"Index {index} out of range for {len(items)} items")
     
     W, H = size
-    total_frames = int((ZOOM_DURATION + PAUSE_START + PAUSE_END) * ZOOM_FPS)
-    pause_start_frames = int(PAUSE_START * ZOOM_FPS)
-    pause_end_frames = int(PAUSE_END * ZOOM_FPS)
+    # The grid is laid out at *size*; frames are written at the render tier's scale and fps
+    tier = get_tier()
+    fps = min(ZOOM_FPS, tier["fps"])
+    out_size = scaled_size(size)
+    total_frames = int((ZOOM_DURATION + PAUSE_START + PAUSE_END) * fps)
+    pause_start_frames = int(PAUSE_START * fps)
+    pause_end_frames = int(PAUSE_END * fps)
     zoom_frames = total_frames - pause_start_frames - pause_end_frames
     
     frames = []
     
     # Generate TTS for the idea name and measure duration
     idea_label = str(items[index].get("subject", f"item_{index}")).strip() or f"item_{index}"
-    tts_path = getTTS(idea_label)
+    tts_path = getCanonicalAudio(getTTS(idea_label))
     audio_len = getAudioLength(tts_path)
     end_linger = 0.35  # slight delay to avoid a rushed cut when audio runs long
 
@@ -587,36 +582,35 @@ def zoomintoidea(items: List[Dict[str, str]],
         
         # Crop and resize
         cropped = frame.crop((int(left), int(top), int(right), int(bottom)))
-        frame_resized = cropped.resize((W, H), Image.LANCZOS)
+        frame_resized = cropped.resize(out_size, Image.LANCZOS)
         
         # Convert to RGB for video
         frame_rgb = frame_resized.convert('RGB')
         frames.append(np.array(frame_rgb))
     
     # If audio is longer than animation, hold the last frame until audio completes (+ small linger)
-    base_duration = len(frames) / ZOOM_FPS
+    base_duration = len(frames) / fps
     target_min_duration = audio_len + end_linger
     if target_min_duration > base_duration and frames:
         extra_seconds = target_min_duration - base_duration
-        extra_frames = int(math.ceil(extra_seconds * ZOOM_FPS))
+        extra_frames = int(math.ceil(extra_seconds * fps))
         if extra_frames > 0:
             frames.extend([frames[-1]] * extra_frames)
 
     # Create video with silent audio to ensure consistent concat later
-    clip = ImageSequenceClip(frames, fps=ZOOM_FPS)
+    clip = ImageSequenceClip(frames, fps=fps)
     # Use 48kHz silent audio to match the pipeline and avoid resample artifacts later
     silent_audio = AudioClip(lambda t: 0.0, duration=clip.duration, fps=48000)
     clip = clip.with_audio(silent_audio)
     clip.write_videofile(
         output_path,
-        codec='libx264',
         audio_codec='aac',
         audio=True,
-        fps=ZOOM_FPS,
+        fps=fps,
         bitrate=None,
-        audio_bitrate='192k',
         temp_audiofile=None,
-        logger=None
+        logger=None,
+        **moviepy_kwargs(),
     )
 
     # Overlay the TTS audio on the zoom video (video already extended to cover audio)
@@ -2,12 +2,41 @@ from combineVideos import combineVideos
 from create9x16Video import create9x16Video
 from captions import add_tiktok_captions
 from getTTS import getTTS
+from getAudioLength import getAudioLength
+from canonicalAudio import getCanonicalAudio
+from getTimestamps import alignWords
+from tts_alignment import load_alignment
+from makeWholeShot import getWholeShotWords
 from upload_video import publish_short
+from render_quality import get_tier, x264_args, aac_args
 
 import os
 import re
 import subprocess
 
+# Spoken over shortend.png at the end of every short
+END_CLIP_TEXT = "check out the full video on our channel now"
+
+def endClipWords(tts_text: str = END_CLIP_TEXT, voice: str = "Liam"):
+    """Word timings of the end clip's TTS (seconds from the clip start).
+
+    The text is fixed, so it is force-aligned (cached) rather than transcribed;
+    if alignment fails the words are spread evenly over the audio.
+    """
+    audio_path = getCanonicalAudio(getTTS(tts_text, voice=voice))
+    provider_words = load_alignment(audio_path)
+    if provider_words is not None:
+        return provider_words
+    try:
+        return [{"word": w.word, "start": float(w.start), "end": float(w.end)}
+                for w in alignWords(audio_path, tts_text)]
+    except Exception as e:
+        print(f"Warning: end clip alignment failed ({e}); spacing words evenly")
+    tokens = tts_text.split()
+    step = getAudioLength(audio_path) / max(1, len(tokens))
+    return [{"word": t, "start": i * step, "end": (i + 1) * step} for i, t in enumerate(tokens)]
+
+
 def createEndClip(image_path: str, tts_text: str, output_path: str, voice: str = "Liam") -> str:
     """
     Create a video clip from a 9:16 image with TTS audio.
@@ -26,17 +55,11 @@ def createEndClip(image_path: str, tts_text: str, output_path: str, voice: str =
     
     # Generate TTS audio
     print(f"Generating TTS for: '{tts_text}'")
-    audio_path = getTTS(tts_text, voice=voice)
-    
-    # Get audio duration to match video length
-    duration_cmd = [
-        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1', audio_path
-    ]
+    audio_path = getCanonicalAudio(getTTS(tts_text, voice=voice))
     
+    # Get audio duration to match video length (from the canonical audio's metadata)
     try:
-        result = subprocess.run(duration_cmd, capture_output=True, text=True, check=True)
-        audio_duration = float(result.stdout.strip())
+        audio_duration = getAudioLength(audio_path)
     except Exception as e:
         print(f"Could not get audio duration, using default 3 seconds: {e}")
         audio_duration = 3.0
@@ -47,16 +70,20 @@ def createEndClip(image_path: str, tts_text: str, output_path: str, voice: str =
         os.makedirs(output_dir, exist_ok=True)
     
     # Create video from image + audio
+    tier = get_tier()
     cmd = [
         'ffmpeg',
         '-hide_banner', '-loglevel', 'error',
         '-loop', '1',
         '-i', image_path,
         '-i', audio_path,
-        '-c:v', 'libx264',
+        # Image at the render tier's scale (even dimensions for yuv420p)
+        '-vf', f"scale=trunc(iw*{tier['scale']}/2)*2:trunc(ih*{tier['scale']}/2)*2",
+        *x264_args(),
+        '-r', str(tier["fps"]),
         '-t', str(audio_duration),
         '-pix_fmt', 'yuv420p',
-        '-c:a', 'aac',
+        *aac_args(),
         '-shortest',
         '-y',
         output_path
@@ -102,8 +129,8 @@ def speedUpVideo(input_path: str, output_path: str, speed_multiplier: float = 1.
         f'[0:v]setpts=PTS/{speed_multiplier}[v];[0:a]atempo={speed_multiplier}[a]',
         '-map', '[v]',
         '-map', '[a]',
-        '-c:v', 'libx264',
-        '-c:a', 'aac',
+        *x264_args(),
+        *aac_args(),
         '-y',
         output_path
     ]
@@ -139,7 +166,7 @@ def makeAndUploadShort(segment, video_idea, subidea, assetspath, speed_multiplie
     end_clip_filename = f"temp_endclip_{segment_id}.mp4"
     end_clip_path = os.path.join("cache", "shorts", end_clip_filename)
     
-    end_clip = createEndClip(os.path.join(assetspath, "shortend.png"), "check out the full video on our channel now", end_clip_path)
+    end_clip = createEndClip(os.path.join(assetspath, "shortend.png"), END_CLIP_TEXT, end_clip_path)
     print(f"Created end clip: {end_clip}")
     
     # Step 3: Combine main video with end clip
@@ -152,8 +179,23 @@ def makeAndUploadShort(segment, video_idea, subidea, assetspath, speed_multiplie
     # Step 4: Add TikTok-style captions
     temp_captioned_filename = f"temp_captions_{segment_id}.mp4"
     temp_captioned_path = os.path.join("cache", "shorts", temp_captioned_filename)
-    
-    captioned_video = add_tiktok_captions(combined_video, temp_captioned_path, font_path=os.path.join(assetspath, "font.ttf"))
+
+    # Reuse the whole shot's word timings (+ the fixed end clip text) instead of re-running ASR
+    caption_words = None
+    segment_words = getWholeShotWords(segment)
+    if segment_words is not None:
+        try:
+            main_duration = getAudioLength(nine_sixteen_video)
+            caption_words = [w for w in segment_words if w["start"] < main_duration]
+            caption_words += [
+                {"word": w["word"], "start": w["start"] + main_duration, "end": w["end"] + main_duration}
+                for w in endClipWords(END_CLIP_TEXT)
+            ]
+        except Exception as e:
+            print(f"Warning: could not reuse word timings ({e}); transcribing instead")
+            caption_words = None
+
+    captioned_video = add_tiktok_captions(combined_video, temp_captioned_path, font_path=os.path.join(assetspath, "font.ttf"), words=caption_words)
     print(f"Added captions to video: {captioned_video}")
     
     # Step 5: Speed up the final video
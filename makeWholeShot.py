@@ -2,16 +2,20 @@ import json
 import re
 import os
 import hashlib
-import shutil
 from gemini import ask_gemini  # Assuming this exists based on context
-from buildShot import buildShot
+from buildShot import buildShot, getShotLastFrame
 from getTTS import getTTS
-from getTimestamps import get_phrase_timestamps
+from getTimestamps import get_phrase_timestamps, alignWords
+from tts_alignment import load_alignment
+from transcription import transcribe_many
+from whisper_models import load_whisper_config
+from getShotAudio import getShotAudio
 from getImage import getImage
 from getAudioLength import getAudioLength
-from overlayAudioVideo import overlayAudioVideo
-from overWriteFirstSecondsWithLastFrame import overWriteFirstSecondsWithLastFrame
+from canonicalAudio import getCanonicalAudio
 from combineVideos import combineVideos
+from atomic_io import atomic_copy, atomic_write_json, valid_cache_entry
+from render_quality import cache_tag
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 CACHE_DIR = "cache/wholeshot"
@@ -20,10 +24,68 @@ os.makedirs(CACHE_DIR, exist_ok=True)
 # Extra silence to append to the very end of the whole shot (seconds)
 WHOLE_SHOT_END_SILENCE_SECONDS = 0.5
 
+# "per_shot": one TTS request (chained via previous_text) and one transcription per shot.
+# "single":   one TTS request + one transcription for the whole VO, split per shot (getShotAudio).
+WHOLE_SHOT_TTS_MODE = os.getenv("WHOLE_SHOT_TTS_MODE", "per_shot")
+
+# Shots rendered at once (each render is already time-sharded across cores)
+WHOLE_SHOT_RENDER_WORKERS = int(os.getenv("WHOLE_SHOT_RENDER_WORKERS", "2"))
+
 def _cache_path(concept, larger_video):
-    key_src = f"{concept}|{larger_video}".encode("utf-8")
+    key_src = f"{concept}|{larger_video}"
+    if WHOLE_SHOT_TTS_MODE != "per_shot":
+        key_src += f"|{WHOLE_SHOT_TTS_MODE}"
+    key_src += cache_tag()
+    key_src = key_src.encode("utf-8")
     return os.path.join(CACHE_DIR, hashlib.md5(key_src).hexdigest() + ".mp4")
 
+def words_path(video_path):
+    """Sidecar holding the whole shot's word timings (seconds from its start)."""
+    return os.path.splitext(video_path)[0] + ".words.json"
+
+
+def getWholeShotWords(video_path):
+    """Word timings [{"word", "start", "end"}] of a whole shot built by
+    makeWholeShot, or None if the video has no (valid) sidecar."""
+    path = words_path(video_path)
+    if not valid_cache_entry(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["words"]
+    except Exception as e:
+        print(f"Warning: failed to read word timings {path}: {e}")
+        return None
+
+
+def _all_shot_words(vo_paths, scripts):
+    """Word timings of every shot's TTS: the provider's alignment if stored,
+    else forced alignment of its known script, with all shots that cannot be
+    aligned transcribed together in one batch."""
+    words = [None] * len(vo_paths)
+    for i, (vo_tts, script) in enumerate(zip(vo_paths, scripts)):
+        words[i] = load_alignment(vo_tts)
+        if words[i] is not None:
+            continue
+        try:
+            words[i] = [{"word": w.word, "start": float(w.start), "end": float(w.end)}
+                        for w in alignWords(vo_tts, script)]
+        except Exception as e:
+            print(f"Warning: forced alignment failed for shot {i} ({e}); will transcribe")
+
+    missing = [vo_paths[i] for i, w in enumerate(words) if w is None]
+    if missing:
+        cfg = load_whisper_config()
+        # VAD on: it is what lets faster-whisper batch each file's speech segments
+        transcribed = transcribe_many(missing, cfg["model"], "cpu", cfg["compute_type"],
+                                      vad_filter=True, beam_size=cfg["beam_size"],
+                                      cpu_threads=cfg["cpu_threads"])
+        for i, w in enumerate(words):
+            if w is None:
+                words[i] = transcribed[vo_paths[i]]
+    return words
+
+
 VO_PLAN="""Write a one minute long VO script for the following concept in the context of the larger video.
 Concept: {concept}
 Larger Video: {larger_video}
@@ -194,6 +256,23 @@ def get_valid_media_plan(vo_script, max_attempts: int = 3):
             return plan
         print(f"Media plan validation failed on attempt {attempt}—retrying...")
     # raise ValueError(f"Failed to obtain a valid media plan after {max_attempts} attempts")
+
+def getWholeShotPlan(concept, larger_video):
+    """Return the shot-by-shot media plan for *concept* (VO script + media plan).
+    Both Gemini calls are cached, so calling this ahead of makeWholeShot is free later."""
+    vo_plan = VO_PLAN.format(concept=concept.strip(), larger_video=larger_video.strip())
+    vo_script = ask_gemini(vo_plan,model="gemini-2.5-pro")
+    return get_valid_media_plan(vo_script, max_attempts=3)
+
+def planWholeShotTTS(media_plan, voice: str = "Liam"):
+    """List the (text, voice, previous_text) TTS requests makeWholeShot will make for *media_plan*."""
+    if WHOLE_SHOT_TTS_MODE == "single":
+        return [(" ".join(shot["vo"].strip() for shot in media_plan), voice, None)]
+    return [
+        (media_plan[i]["vo"], voice, media_plan[i-1]["vo"] if i > 0 else None)
+        for i in range(len(media_plan))
+    ]
+
 def makeWholeShot(concept, larger_video, assetspath: str = "."):
     concept = concept.strip()
     larger_video = larger_video.strip()
@@ -204,13 +283,10 @@ def makeWholeShot(concept, larger_video, assetspath: str = "."):
 
     cache_path = _cache_path(concept, larger_video)
     
-    if os.path.exists(cache_path):
+    if valid_cache_entry(cache_path):
         return cache_path
 
-    vo_plan = VO_PLAN.format(concept=concept, larger_video=larger_video)
-    vo_script = ask_gemini(vo_plan,model="gemini-2.5-pro")
-    
-    media_plan = get_valid_media_plan(vo_script, max_attempts=3)
+    media_plan = getWholeShotPlan(concept, larger_video)
 
     
     # Pre-cache all images up front and in parallel so later calls are fast
@@ -250,13 +326,31 @@ def makeWholeShot(concept, larger_video, assetspath: str = "."):
                     pre_cached_images[job] = path
     SHOT_SWITCH_TIME_PADDING = 0.5
 
-    shot_paths= []
-
-    
-
-    for i in range(len(media_plan)):
-        vo_tts = getTTS(media_plan[i]["vo"], voice="Liam", previous_text=media_plan[i-1]["vo"] if i>0 else None)
-        media_timestamps_map = get_phrase_timestamps([x["appearAt"] for x in media_plan[i]["media"]], vo_tts)
+    shot_audio = None
+    if WHOLE_SHOT_TTS_MODE == "single":
+        # One TTS round trip and one transcription for the whole VO, split per shot
+        shot_audio = getShotAudio([shot["vo"] for shot in media_plan], voice="Liam")
+    else:
+        tts_jobs = planWholeShotTTS(media_plan, voice="Liam")
+        # Work from the canonical 48 kHz PCM derivative: no mp3 decode/resample downstream
+        vo_paths = [getCanonicalAudio(getTTS(text, voice=voice, previous_text=previous_text))
+                    for text, voice, previous_text in tts_jobs]
+        vo_words = _all_shot_words(vo_paths, [job[0] for job in tts_jobs])
+
+    font_path = os.path.join(assetspath, "font.ttf")
+    background_path = os.path.join(assetspath, "background.png")
+    last_shot = len(media_plan) - 1
+
+    def _plan_shot(i):
+        """Phrase timings and media for shot *i* -> buildShot keyword arguments."""
+        appear_phrases = [x["appearAt"] for x in media_plan[i]["media"]]
+        if shot_audio is not None:
+            vo_tts = shot_audio[i]["path"]
+            words = shot_audio[i]["words"]
+        else:
+            vo_tts = vo_paths[i]
+            words = vo_words[i]
+        media_timestamps_map = get_phrase_timestamps(appear_phrases, vo_tts, words=words)
 
         clean_media=[]
         for media in media_plan[i]["media"]:
@@ -277,27 +371,64 @@ def makeWholeShot(concept, larger_video, assetspath: str = "."):
 
         # Base duration equals the TTS audio length plus the original 1s hold; add extra end silence only for the final shot
         duration_seconds = getAudioLength(vo_tts) + 1
-        if i == len(media_plan) - 1:
+        if i == last_shot:
             duration_seconds += WHOLE_SHOT_END_SILENCE_SECONDS
-        shot_path = buildShot(clean_media, duration_seconds, 
-                             font_path=os.path.join(assetspath, "font.ttf"),
-                             background_path=os.path.join(assetspath, "background.png"))
-        if i == len(media_plan) - 1:
-            overlayAudioVideo(shot_path, vo_tts, trim_to_shortest=False)
-        else:
-            overlayAudioVideo(shot_path, vo_tts)
+        shot = {
+            "media_plan": clean_media,
+            "duration": duration_seconds,
+            "font_path": font_path,
+            "background_path": background_path,
+            # VO muxed in; every shot but the final one ends with its VO
+            "audio_path": vo_tts,
+            "trim_to_audio": i != last_shot,
+        }
+        # First media time (unmatched phrases have no timestamp); only later shots hold before it
+        first_media = None
+        if i > 0:
+            timestamps = [ts for ts in media_timestamps_map.values() if ts is not None]
+            first_media = min(timestamps) if timestamps else None
+        return shot, words, first_media
+
+    with ThreadPoolExecutor(max_workers=max(1, len(media_plan))) as executor:
+        planned = list(executor.map(_plan_shot, range(len(media_plan))))
+    shots = [shot for shot, _, _ in planned]
+    shot_words = [words for _, words, _ in planned]
+
+    # Later shots open on the previous shot's last frame until just before their first media.
+    # That frame is computed from the previous shot's plan, so no shot waits on another's render.
+    for i in range(1, len(shots)):
+        first_media = planned[i][2]
+        if first_media is None:
+            continue
+        hold_seconds = first_media - SHOT_SWITCH_TIME_PADDING
+        if hold_seconds > 0:
+            shots[i]["hold_image"] = getShotLastFrame(**shots[i - 1])
+            shots[i]["hold_seconds"] = hold_seconds
 
-        if i>0: 
-            firstMediaTimestamp = min(media_timestamps_map.values())
-            overWriteFirstSecondsWithLastFrame(shot_path, shot_paths[-1], firstMediaTimestamp-SHOT_SWITCH_TIME_PADDING)
-        shot_paths.append(shot_path)
+    # One encode per shot (frames, VO and intro hold), all shots at once
+    with ThreadPoolExecutor(max_workers=max(1, min(WHOLE_SHOT_RENDER_WORKERS, len(shots)))) as executor:
+        shot_paths = list(executor.map(lambda shot: buildShot(**shot), shots))
 
     # Generate temporary output path
     temp_output = "temp_output.mp4"
     combineVideos(shot_paths, temp_output)
     
-    # Copy to cache
-    shutil.copy2(temp_output, cache_path)
+    # Shift each shot's words by where that shot starts in the concatenation
+    all_words = []
+    offset = 0.0
+    for path, words in zip(shot_paths, shot_words):
+        all_words.extend(
+            {"word": w["word"], "start": round(w["start"] + offset, 3), "end": round(w["end"] + offset, 3)}
+            for w in words
+        )
+        offset += getAudioLength(path)
+
+    # Publish to cache atomically so a killed run never leaves a truncated hit
+    atomic_copy(temp_output, cache_path)
+    try:
+        atomic_write_json(words_path(cache_path), {"words": all_words}, ensure_ascii=False)
+    except Exception as e:
+        print(f"Warning: failed to write word timings for {cache_path}: {e}")
     
     # Clean up temporary file
     os.remove(temp_output)
@@ -102,6 +102,7 @@ import os
 from typing import Optional
 import cv2  # type: ignore
 from getLastFrame import getLastFrame
+from render_quality import x264_args
 
 def overWriteFirstSecondsWithLastFrame(modify_path: str, source_path: str, duration: float, fps: Optional[float] = None) -> str:
     """Overwrite the first N frames (duration * fps) of `modify_path` with the last
@@ -219,11 +220,10 @@ def overWriteFirstSecondsWithLastFrame(modify_path: str, source_path: str, durat
             "-i", modify_path,
             "-map", "0:v:0",
             "-map", "1:a:0?",
-            "-c:v", "libx264",
+            *x264_args(),
             "-pix_fmt", "yuv420p",
             "-r", f"{video_fps}",
             "-vsync", "cfr",
-            "-preset", "medium",
             "-movflags", "+faststart",
             "-c:a", "copy",
             temp_output,
@@ -1,5 +1,7 @@
 import subprocess
 import os
+from canonicalAudio import getAudioMeta, CANONICAL_SAMPLE_RATE, CANONICAL_CHANNELS
+from render_quality import aac_args
 
 def overlayAudioVideo(video_path: str, audio_path: str, trim_to_shortest: bool = True) -> str:
     """Overlay audio directly on video using ffmpeg, overwriting the original video file.
@@ -22,6 +24,14 @@ def overlayAudioVideo(video_path: str, audio_path: str, trim_to_shortest: bool =
     video_path = os.path.normpath(video_path)
     audio_path = os.path.normpath(audio_path)
     
+    # Canonical TTS audio (48 kHz stereo PCM) needs no resampling, only the AAC encode
+    meta = getAudioMeta(audio_path)
+    is_canonical = bool(
+        meta
+        and meta.get("sample_rate") == CANONICAL_SAMPLE_RATE
+        and meta.get("channels") == CANONICAL_CHANNELS
+    )
+
     # Create temporary output file with proper mp4 extension
     temp_output = video_path.replace('.mp4', '_temp.mp4')
     
@@ -36,12 +46,14 @@ def overlayAudioVideo(video_path: str, audio_path: str, trim_to_shortest: bool =
             '-map', '0:v:0?',          # first input video
             '-map', '1:a:0?',          # second input audio
             '-c:v', 'copy',            # keep video as-is
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            '-ar', '48000',            # standard video sample rate
-            '-ac', '2',
-            '-af', 'aresample=async=1:first_pts=0',  # fix timestamps & resample
+            *aac_args(),
         ]
+        if not is_canonical:
+            cmd += [
+                '-ar', '48000',            # standard video sample rate
+                '-ac', '2',
+                '-af', 'aresample=async=1:first_pts=0',  # fix timestamps & resample
+            ]
 
         if trim_to_shortest:
             cmd.append('-shortest')
@@ -0,0 +1,104 @@
+"""
+Decoded-PCM cache shared by transcription, alignment and muxing.
+
+  • 16 kHz mono float32 (what Whisper consumes) is stored as a .npy per
+    source file, keyed by the source's content hash, and opened memory-mapped.
+  • 48 kHz stereo int16 (what the muxers consume) is the canonical WAV from
+    canonicalAudio; its data chunk is memory-mapped in place, so it is not
+    stored twice.
+
+Durations come from the array lengths, with no ffprobe call (getAudioLength
+uses ``pcm_duration`` whenever a canonical WAV exists). The ffmpeg muxers
+take the canonical WAV itself as their input.
+"""
+import os
+import struct
+import subprocess
+
+import numpy as np
+
+from atomic_io import atomic_path, content_hash, valid_cache_entry
+from canonicalAudio import getCanonicalAudio, canonical_path, CANONICAL_SAMPLE_RATE, CANONICAL_CHANNELS
+
+CACHE_DIR = "cache/pcm"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+ASR_SAMPLE_RATE = 16000
+
+
+def _is_valid_npy(path: str) -> bool:
+    try:
+        np.load(path, mmap_mode="r")
+        return True
+    except Exception:
+        return False
+
+
+def asr_pcm_path(audio_path: str) -> str:
+    return os.path.join(CACHE_DIR, content_hash(audio_path) + ".f32.npy")
+
+
+def get_asr_pcm(audio_path: str) -> np.ndarray:
+    """16 kHz mono float32 samples of *audio_path* (audio or video), memory-mapped.
+
+    Decoded once per distinct content; a canonical WAV next to the source is
+    preferred as the decode input since it needs no mp3 decode.
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    npy_path = asr_pcm_path(audio_path)
+    if valid_cache_entry(npy_path, _is_valid_npy):
+        return np.load(npy_path, mmap_mode="r")
+
+    source = canonical_path(audio_path)
+    if source == audio_path or not valid_cache_entry(source):
+        source = audio_path
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+        '-i', source,
+        '-vn',
+        '-ac', '1',
+        '-ar', str(ASR_SAMPLE_RATE),
+        '-f', 'f32le', '-',
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode {audio_path}: {e.stderr.decode(errors='replace')}")
+
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    with atomic_path(npy_path) as tmp_path:
+        np.save(tmp_path, samples)
+    return np.load(npy_path, mmap_mode="r")
+
+
+def _wav_data_chunk(wav_path: str):
+    """(byte offset, byte length) of the data chunk of a RIFF/WAVE file."""
+    with open(wav_path, "rb") as f:
+        riff, _size, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{wav_path} is not a WAV file")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{wav_path} has no data chunk")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"data":
+                return f.tell(), chunk_size
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def get_mux_pcm(audio_path: str) -> np.ndarray:
+    """48 kHz stereo int16 samples of *audio_path*, shape (frames, 2),
+    memory-mapped straight from its canonical WAV."""
+    wav_path = getCanonicalAudio(audio_path)
+    offset, length = _wav_data_chunk(wav_path)
+    frame_bytes = 2 * CANONICAL_CHANNELS
+    available = (os.path.getsize(wav_path) - offset) // frame_bytes
+    frames = min(length // frame_bytes, available)
+    return np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(frames, CANONICAL_CHANNELS))
+
+
+def pcm_duration(audio_path: str) -> float:
+    """Duration in seconds from the canonical PCM array length."""
+    return len(get_mux_pcm(audio_path)) / float(CANONICAL_SAMPLE_RATE)
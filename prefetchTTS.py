@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from getTTS import getTTS, _cache_path, cached_tts_path
+
+# How many TTS requests may be in flight at once (FAL rate limits apply)
+TTS_PREFETCH_CONCURRENCY = int(os.getenv("TTS_PREFETCH_CONCURRENCY", "4"))
+
+# (text, voice, previous_text) — exactly the arguments getTTS will later be called with
+TTSJob = Tuple[str, str, Optional[str]]
+
+
+def planRunTTS(subideas: List[Dict[str, str]],
+               video_idea: str,
+               short_count: int = 0,
+               voice: str = "Liam") -> List[TTSJob]:
+    """List every TTS request a full run will make, deduplicated, in run order.
+
+    Covers the zoom label of every subidea (zoomintoidea), every shot VO of every
+    whole shot that is not already cached (makeWholeShot) and the end clip of the
+    shorts (createEndClip). Media plans come from Gemini's on-disk cache, so
+    building them here costs nothing extra later.
+    """
+    from makeWholeShot import getWholeShotPlan, planWholeShotTTS, _cache_path as _wholeshot_cache_path
+    from makeAndUploadShort import END_CLIP_TEXT
+
+    jobs: List[TTSJob] = []
+    for idx, sub in enumerate(subideas):
+        label = str(sub.get("subject", f"item_{idx}")).strip() or f"item_{idx}"
+        jobs.append((label, voice, None))
+
+    for sub in subideas:
+        subject = sub.get("subject", "")
+        if not subject or os.path.exists(_wholeshot_cache_path(subject.strip(), video_idea.strip())):
+            continue
+        media_plan = getWholeShotPlan(subject, video_idea)
+        if not media_plan:
+            continue
+        jobs.extend(planWholeShotTTS(media_plan, voice=voice))
+
+    if short_count > 0:
+        jobs.append((END_CLIP_TEXT, voice, None))
+
+    # Deduplicate on the getTTS cache key while preserving order
+    unique: Dict[str, TTSJob] = {}
+    for text, v, prev in jobs:
+        if not text or not text.strip():
+            continue
+        unique.setdefault(_cache_path(text, voice=v, previous_text=prev), (text, v, prev))
+    return list(unique.values())
+
+
+def prefetchTTS(jobs: List[TTSJob], max_workers: Optional[int] = None) -> Dict[TTSJob, Optional[str]]:
+    """Synthesize *jobs* concurrently into cache/tts so later getTTS calls are cache hits.
+
+    Failures are logged and reported as None; the pipeline will retry them
+    (and surface the error) when it reaches that utterance.
+    """
+    cached = {job: cached_tts_path(job[0], voice=job[1], previous_text=job[2]) for job in jobs}
+    pending = [job for job in jobs if not cached[job]]
+    results: Dict[TTSJob, Optional[str]] = {job: path for job, path in cached.items() if path}
+    if not pending:
+        return results
+
+    workers = max(1, min(max_workers or TTS_PREFETCH_CONCURRENCY, len(pending)))
+    print(f"TTS prefetch: {len(pending)} of {len(jobs)} utterances to synthesize ({workers} concurrent)")
+
+    def _fetch(job: TTSJob):
+        text, voice, previous_text = job
+        try:
+            return job, getTTS(text, voice=voice, previous_text=previous_text)
+        except Exception as e:
+            print(f"TTS prefetch failed for {text[:60]!r}: {e}")
+            return job, None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_fetch, job) for job in pending]
+        for fut in as_completed(futures):
+            job, path = fut.result()
+            results[job] = path
+    return results
@@ -0,0 +1,117 @@
+"""
+Scaled-raster cache for buildShot images.
+
+The same downloaded image is often used in several shots and across
+re-renders. Rasters are keyed by (image content hash, target size, resampling
+filter) and kept
+
+  • in memory, in an LRU bounded by RASTER_CACHE_MEMORY_MB, and
+  • on disk under cache/rasters as .npy files opened memory-mapped,
+
+so repeated layouts skip both the decode and the resample.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+from atomic_io import atomic_path, content_hash, valid_cache_entry
+from compositor import to_rgba_array
+
+CACHE_DIR = "cache/rasters"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+RASTER_CACHE_MEMORY_MB = int(os.getenv("RASTER_CACHE_MEMORY_MB", "512"))
+
+RESAMPLE_FILTERS = {
+    "lanczos": Image.LANCZOS,
+    "bicubic": Image.BICUBIC,
+    "bilinear": Image.BILINEAR,
+    "nearest": Image.NEAREST,
+}
+
+# Bump when decoding/resampling changes the pixels (old disk entries are then unused)
+CACHE_VERSION = 2
+
+_LOCK = threading.Lock()
+_MEMORY: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_MEMORY_BYTES = 0
+
+
+def _key(digest: str, size: Tuple[int, int], resample: str) -> str:
+    return hashlib.md5(f"{CACHE_VERSION}|{digest}|{size[0]}x{size[1]}|{resample}".encode("utf-8")).hexdigest()
+
+
+def _is_valid_npy(path: str) -> bool:
+    try:
+        arr = np.load(path, mmap_mode="r")
+        return arr.ndim == 3 and arr.shape[2] == 4
+    except Exception:
+        return False
+
+
+def _remember(key: str, arr: np.ndarray) -> None:
+    global _MEMORY_BYTES
+    budget = RASTER_CACHE_MEMORY_MB * 1024 * 1024
+    with _LOCK:
+        if key in _MEMORY:
+            _MEMORY.move_to_end(key)
+            return
+        _MEMORY[key] = arr
+        _MEMORY_BYTES += arr.nbytes
+        while _MEMORY_BYTES > budget and len(_MEMORY) > 1:
+            _, evicted = _MEMORY.popitem(last=False)
+            _MEMORY_BYTES -= evicted.nbytes
+
+
+def _decode_scaled(path: str, size: Tuple[int, int], resample: str) -> np.ndarray:
+    """Decode *path* straight to *size*. JPEGs are decoded by libjpeg at the
+    smallest 1/2^n scale that still covers *size* (``draft``), so a huge
+    source never materializes at full resolution; other formats decode in
+    full once and are freed right after the resample."""
+    with Image.open(path) as img:
+        if img.format == "JPEG" and (img.width > size[0] and img.height > size[1]):
+            img.draft(img.mode, size)
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            # Pillow resamples palette ("P") and 1-bit images with NEAREST whatever the filter
+            img = img.convert("RGBA")
+        if img.size != size:
+            # reducing_gap: box-reduce first, then filter (as Image.thumbnail does)
+            img = img.resize(size, RESAMPLE_FILTERS[resample], reducing_gap=2.0)
+        return to_rgba_array(img)
+
+
+def get_scaled_raster(path: str, size: Tuple[int, int], resample: str = "lanczos") -> np.ndarray:
+    """RGBA uint8 array of the image at *path* scaled to *size* (w, h).
+
+    Memory hits return the cached array; disk hits return a read-only
+    memory-mapped array.
+    """
+    size = (max(1, int(size[0])), max(1, int(size[1])))
+    if resample not in RESAMPLE_FILTERS:
+        raise ValueError(f"Unknown resample filter: {resample}")
+    key = _key(content_hash(path), size, resample)
+
+    with _LOCK:
+        arr = _MEMORY.get(key)
+        if arr is not None:
+            _MEMORY.move_to_end(key)
+            return arr
+
+    npy_path = os.path.join(CACHE_DIR, key + ".npy")
+    if valid_cache_entry(npy_path, _is_valid_npy):
+        arr = np.load(npy_path, mmap_mode="r")
+    else:
+        arr = _decode_scaled(path, size, resample)
+        try:
+            with atomic_path(npy_path) as tmp_path:
+                np.save(tmp_path, arr)
+        except Exception as e:
+            print(f"Warning: failed to write raster cache {npy_path}: {e}")
+    _remember(key, arr)
+    return arr
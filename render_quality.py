@@ -0,0 +1,83 @@
+"""
+Render quality tiers.
+
+Every encode in the pipeline takes its output scale, frame rate, x264
+preset/CRF/tune and AAC bitrate from one named tier, chosen with the
+RENDER_TIER environment variable:
+
+  • draft  - half resolution, 15 fps, ultrafast; for previewing a whole idea
+  • review - 3/4 resolution, 30 fps, veryfast
+  • final  - full resolution, 30 fps, medium (the upload settings)
+
+Stages lay out at their nominal size (e.g. 1920x1080) and multiply by the
+tier's scale, so a tier never changes a layout, only its pixel count. Cached
+renders include ``cache_tag()`` in their keys.
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+TIERS: Dict[str, Dict[str, Any]] = {
+    "draft": {"scale": 0.5, "fps": 15, "preset": "ultrafast", "crf": 30, "tune": "fastdecode", "audio_bitrate": "96k"},
+    "review": {"scale": 0.75, "fps": 30, "preset": "veryfast", "crf": 26, "tune": None, "audio_bitrate": "128k"},
+    "final": {"scale": 1.0, "fps": 30, "preset": "medium", "crf": 23, "tune": None, "audio_bitrate": "192k"},
+}
+DEFAULT_TIER = "final"
+
+RENDER_TIER = os.getenv("RENDER_TIER", DEFAULT_TIER).strip().lower()
+if RENDER_TIER not in TIERS:
+    print(f"Warning: unknown RENDER_TIER {RENDER_TIER!r}; using {DEFAULT_TIER!r}")
+    RENDER_TIER = DEFAULT_TIER
+
+
+def get_tier(name: Optional[str] = None) -> Dict[str, Any]:
+    """Settings of tier *name* (default: RENDER_TIER), including its name."""
+    name = name or RENDER_TIER
+    if name not in TIERS:
+        raise ValueError(f"Unknown render tier: {name}")
+    return {"name": name, **TIERS[name]}
+
+
+def scaled(px: float, tier: Optional[str] = None) -> int:
+    """Nominal pixel length *px* at the tier's scale."""
+    return max(1, int(round(px * get_tier(tier)["scale"])))
+
+
+def scaled_size(size: Tuple[int, int], tier: Optional[str] = None) -> Tuple[int, int]:
+    """Nominal frame size at the tier's scale, rounded to even dimensions (yuv420p)."""
+    k = get_tier(tier)["scale"]
+    return tuple(max(2, int(round(n * k / 2.0)) * 2) for n in size)
+
+
+def x264_args(tier: Optional[str] = None) -> List[str]:
+    """ffmpeg video encoder arguments for the tier."""
+    t = get_tier(tier)
+    args = ['-c:v', 'libx264', '-preset', t["preset"], '-crf', str(t["crf"])]
+    if t["tune"]:
+        args += ['-tune', t["tune"]]
+    return args
+
+
+def aac_args(tier: Optional[str] = None) -> List[str]:
+    """ffmpeg audio encoder arguments for the tier."""
+    return ['-c:a', 'aac', '-b:a', get_tier(tier)["audio_bitrate"]]
+
+
+def moviepy_kwargs(tier: Optional[str] = None) -> Dict[str, Any]:
+    """``write_videofile`` keyword arguments for the tier (fps is left to the caller)."""
+    t = get_tier(tier)
+    params = ['-crf', str(t["crf"])]
+    if t["tune"]:
+        params += ['-tune', t["tune"]]
+    return {
+        "codec": "libx264",
+        "preset": t["preset"],
+        "audio_bitrate": t["audio_bitrate"],
+        "ffmpeg_params": params,
+    }
+
+
+def cache_tag(tier: Optional[str] = None) -> str:
+    """Cache-key suffix for the tier; empty for the final tier so existing
+    final renders stay valid."""
+    name = get_tier(tier)["name"]
+    return "" if name == DEFAULT_TIER else f"|tier={name}"
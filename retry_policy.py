@@ -0,0 +1,325 @@
+"""
+Shared retry / backoff / circuit-breaker policy for every external provider.
+
+Every network call to Gemini, FAL (ElevenLabs TTS), Serper, the image hosts
+returned by Serper and the YouTube upload API goes through ``call_with_retry``
+so they all behave the same way:
+
+  • exponential backoff with jitter between attempts
+  • ``Retry-After`` (seconds or HTTP date) is honoured when the provider sends it
+  • a per-provider retry budget (token bucket) so a flapping provider cannot
+    multiply our request volume
+  • a per-provider circuit breaker: after N consecutive failures calls fail
+    immediately with ``CircuitOpenError`` until a cool-down has passed, so
+    worker pools move on to other work instead of sleeping on a dead provider
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+# Status codes that are worth retrying; everything else >= 400 is a caller error
+RETRIABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Never sleep longer than this, even if the provider asks for it via Retry-After
+MAX_RETRY_AFTER_SECONDS = 120.0
+
+# ─── Per-provider policies ─────────────────────────────────────────────────────
+# max_attempts       total tries per call (1 = no retries)
+# base_delay         first backoff ceiling in seconds (doubles every attempt)
+# max_delay          cap for the exponential backoff ceiling
+# failure_threshold  consecutive failures that open the circuit (None = never)
+# reset_timeout      seconds the circuit stays open before a half-open probe
+# budget             retry tokens available; each retry spends one
+# budget_refill      tokens returned to the bucket for every successful call
+DEFAULT_POLICY: Dict[str, Any] = {
+    "max_attempts": 3,
+    "base_delay": 1.0,
+    "max_delay": 30.0,
+    "failure_threshold": 5,
+    "reset_timeout": 60.0,
+    "budget": 20.0,
+    "budget_refill": 0.2,
+}
+
+PROVIDER_POLICIES: Dict[str, Dict[str, Any]] = {
+    "gemini": {"max_attempts": 3, "base_delay": 1.0, "max_delay": 20.0},
+    "gemini_files": {"max_attempts": 3, "base_delay": 2.0, "max_delay": 30.0, "failure_threshold": 3},
+    "fal_tts": {"max_attempts": 3, "base_delay": 1.0, "max_delay": 20.0},
+    "serper": {"max_attempts": 3, "base_delay": 1.0, "max_delay": 10.0},
+    # Image URLs point at arbitrary hosts, so one bad host must not trip a breaker
+    "image_download": {"max_attempts": 2, "base_delay": 0.5, "max_delay": 2.0, "failure_threshold": None, "budget": 50.0},
+    "youtube": {"max_attempts": 11, "base_delay": 1.0, "max_delay": 64.0, "failure_threshold": None},
+}
+
+
+class RetryableError(Exception):
+    """Raise inside a retried call to force a retry (empty response, HTTP 5xx, ...)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class EmptyResponseError(RetryableError):
+    """The provider answered but returned no content: retried, but not counted
+    against the provider's circuit breaker (the provider is up)."""
+
+
+class ProviderError(RuntimeError):
+    """Non-retriable provider error (typically an HTTP 4xx)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the provider while its circuit is open."""
+
+
+def get_policy(provider: str) -> Dict[str, Any]:
+    policy = dict(DEFAULT_POLICY)
+    policy.update(PROVIDER_POLICIES.get(provider, {}))
+    return policy
+
+
+# ─── Retry-After / status helpers ──────────────────────────────────────────────
+
+def retry_after_seconds(source: Any) -> Optional[float]:
+    """Return the Retry-After delay (seconds) from a response, headers mapping or
+    exception, or None if not present/parseable."""
+    if source is None:
+        return None
+    if isinstance(source, BaseException):
+        explicit = getattr(source, "retry_after", None)
+        if explicit is not None:
+            return float(explicit)
+        # requests.HTTPError / google errors / googleapiclient HttpError
+        # (explicit None checks: a requests.Response is falsy for status >= 400)
+        response = getattr(source, "response", None)
+        if response is None:
+            response = getattr(source, "resp", None)
+        return retry_after_seconds(response)
+
+    headers = getattr(source, "headers", source)
+    try:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+    except Exception:
+        return None
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for holder in (exc, getattr(exc, "response", None), getattr(exc, "resp", None)):
+        if holder is None:
+            continue
+        for attr in ("status_code", "status", "code"):
+            val = getattr(holder, attr, None)
+            if isinstance(val, int) and 100 <= val <= 599:
+                return val
+    return None
+
+
+def is_retriable(exc: BaseException) -> bool:
+    """Default classification: retry everything except known client errors."""
+    if isinstance(exc, RetryableError):
+        return True
+    if isinstance(exc, (CircuitOpenError, ValueError, FileNotFoundError, KeyboardInterrupt)):
+        return False
+    status = _status_code(exc)
+    if status is not None and 400 <= status < 500 and status not in RETRIABLE_STATUS_CODES:
+        return False
+    return True
+
+
+def raise_for_status(response: Any, context: str = "") -> None:
+    """Like ``requests.Response.raise_for_status`` but classifies the error:
+    RetryableError for 408/429/5xx (carrying Retry-After), ProviderError otherwise."""
+    status = response.status_code
+    if status < 400:
+        return
+    try:
+        body = response.text[:1000]
+    except Exception:
+        body = "<failed to read body>"
+    msg = f"HTTP {status}{(' from ' + context) if context else ''}; body: {body}"
+    if status in RETRIABLE_STATUS_CODES:
+        raise RetryableError(msg, retry_after=retry_after_seconds(response))
+    raise ProviderError(msg, status)
+
+
+def backoff_delay(provider: str, attempt: int, retry_after: Optional[float] = None) -> float:
+    """Delay before retry number *attempt* (1-based): jittered exponential
+    backoff, or the provider's Retry-After if it asks for longer."""
+    policy = get_policy(provider)
+    ceiling = min(policy["max_delay"], policy["base_delay"] * (2 ** max(0, attempt - 1)))
+    delay = random.uniform(ceiling / 2.0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(float(retry_after), MAX_RETRY_AFTER_SECONDS))
+    return delay
+
+
+# ─── Circuit breakers and retry budgets ────────────────────────────────────────
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed → open → half-open → closed)."""
+
+    def __init__(self, provider: str, failure_threshold: Optional[int], reset_timeout: float):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        if self.failure_threshold is None:
+            return
+        with self._lock:
+            state = self._state_locked()
+            if state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                raise CircuitOpenError(f"{self.provider}: circuit open, retry in {remaining:.0f}s")
+            if state == "half_open":
+                # Only one probe at a time; everyone else keeps failing fast
+                if self.probe_in_flight:
+                    raise CircuitOpenError(f"{self.provider}: circuit half-open, probe in flight")
+                self.probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Let another caller probe a half-open circuit without changing its state."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        if self.failure_threshold is None:
+            return
+        with self._lock:
+            self.failures += 1
+            was_probe = self.probe_in_flight
+            self.probe_in_flight = False
+            if was_probe or self.failures >= self.failure_threshold:
+                if self.opened_at is None or was_probe:
+                    print(f"[retry] {self.provider}: circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """Token bucket limiting how many retries a provider may consume."""
+
+    def __init__(self, capacity: float, refill: float):
+        self.capacity = capacity
+        self.refill = refill
+        self.tokens = capacity
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + self.refill)
+
+
+_STATE_LOCK = threading.Lock()
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BUDGETS: Dict[str, RetryBudget] = {}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _STATE_LOCK:
+        breaker = _BREAKERS.get(provider)
+        if breaker is None:
+            policy = get_policy(provider)
+            breaker = CircuitBreaker(provider, policy["failure_threshold"], policy["reset_timeout"])
+            _BREAKERS[provider] = breaker
+        return breaker
+
+
+def _get_budget(provider: str) -> RetryBudget:
+    with _STATE_LOCK:
+        budget = _BUDGETS.get(provider)
+        if budget is None:
+            policy = get_policy(provider)
+            budget = RetryBudget(policy["budget"], policy["budget_refill"])
+            _BUDGETS[provider] = budget
+        return budget
+
+
+def call_with_retry(provider: str,
+                    fn: Callable[[], Any],
+                    *,
+                    max_attempts: Optional[int] = None,
+                    retriable: Callable[[BaseException], bool] = is_retriable,
+                    description: str = "") -> Any:
+    """Call ``fn()`` under *provider*'s policy and return its result.
+
+    Raises CircuitOpenError immediately while the provider's circuit is open,
+    otherwise re-raises the last exception once attempts or budget run out.
+    """
+    policy = get_policy(provider)
+    attempts = max(1, int(max_attempts or policy["max_attempts"]))
+    breaker = get_breaker(provider)
+    budget = _get_budget(provider)
+    label = f"{provider}{(' ' + description) if description else ''}"
+
+    for attempt in range(1, attempts + 1):
+        breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            retry = retriable(e)
+            if retry and not isinstance(e, EmptyResponseError):
+                breaker.record_failure()
+            else:
+                # Client errors and empty answers say nothing about provider health:
+                # leave the breaker as it is
+                breaker.release_probe()
+            if not retry or attempt >= attempts:
+                raise
+            if not budget.try_spend():
+                print(f"[retry] {label}: retry budget exhausted, giving up after attempt {attempt}")
+                raise
+            delay = backoff_delay(provider, attempt, retry_after_seconds(e))
+            print(f"[retry] {label}: attempt {attempt}/{attempts} failed: {e}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        budget.on_success()
+        return result
@@ -16,11 +16,17 @@ from getMetadata import getMetadata
 from upload_video import publish_simple
 from makeAndUploadShort import makeAndUploadShort
 from image_utils import resize_thumbnail_for_youtube
+from prefetchTTS import planRunTTS, prefetchTTS
+from whisper_models import preload_whisper_model, load_whisper_config
 import os
 import re
 import requests
 
 def runit(assetspath):
+    # Load the Whisper model in the background while Gemini/TTS work runs
+    whisper_cfg = load_whisper_config()
+    preload_whisper_model(whisper_cfg["model"], compute_type=whisper_cfg["compute_type"], cpu_threads=whisper_cfg["cpu_threads"])
+
     def check_ideas_and_notify():
         """Check if next_ideas.txt has fewer than 5 ideas and send Discord webhook if needed."""
         next_ideas_file = os.path.join(assetspath, "next_ideas.txt")
@@ -129,6 +135,11 @@ def runit(assetspath):
     else:
         thumb_path = None
 
+    # Synthesize every utterance of the run up front and concurrently so the
+    # zoom, whole-shot and short stages below only ever hit the TTS cache
+    short_count = min(4, len(subideas))
+    prefetchTTS(planRunTTS(subideas, video_idea, short_count=short_count))
+
     # Ensure zoom cache directory exists
     zoom_dir = os.path.join("cache", "zooms")
     os.makedirs(zoom_dir, exist_ok=True)
@@ -0,0 +1,180 @@
+"""
+Time-sharded rendering of one clip across processes.
+
+A clip is described by a *builder*: a picklable top-level function that,
+given plain-data arguments, returns ``frame_function(t) -> HxWx3 uint8``.
+The timeline is cut into contiguous frame ranges; each worker process calls
+the builder once, pipes its range of raw frames into its own ffmpeg x264
+encode (every shard starts on an IDR frame and GOPs are closed, so shards
+are independent), and the shards are joined with a stream-copy concat.
+
+All shards use the same render-tier encoder settings, so the joined stream
+is identical in format to a single-process encode.
+
+Clips may be rendered from several threads at once (makeWholeShot renders
+its shots concurrently). Worker processes are therefore never forked from
+the caller, which could hold other threads' locks, and all renders in the
+process share one budget of RENDER_SHARDS worker processes.
+"""
+import multiprocessing as mp
+import os
+import subprocess
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from atomic_io import atomic_path, TEMP_PREFIX
+from render_quality import x264_args
+
+# Worker processes per clip (0/unset: one per core)
+RENDER_SHARDS = int(os.getenv("RENDER_SHARDS", "0")) or (os.cpu_count() or 1)
+# Shorter shards cost more in builder setup and GOP restarts than they save
+MIN_SHARD_SECONDS = 4.0
+
+# Fresh interpreters for shard workers (a fork from a threaded parent can deadlock)
+_MP_CONTEXT = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+
+# Worker slots shared by every render in this process
+_SLOTS = threading.Condition()
+_free_slots = RENDER_SHARDS
+
+
+def _acquire_slots(wanted: int) -> int:
+    """Take up to *wanted* worker slots (at least one, waiting if none are free)."""
+    global _free_slots
+    with _SLOTS:
+        while _free_slots <= 0:
+            _SLOTS.wait()
+        got = min(wanted, _free_slots)
+        _free_slots -= got
+        return got
+
+
+def _release_slots(n: int) -> None:
+    global _free_slots
+    with _SLOTS:
+        _free_slots += n
+        _SLOTS.notify_all()
+
+
+def frame_count(duration: float, fps: float) -> int:
+    """Frames in a clip of *duration* seconds (same rule as moviepy)."""
+    return max(1, int(duration * fps))
+
+
+def shard_ranges(n_frames: int, shards: int) -> List[Tuple[int, int]]:
+    """Split [0, n_frames) into *shards* contiguous, near-equal frame ranges."""
+    shards = max(1, min(shards, n_frames))
+    bounds = [round(i * n_frames / shards) for i in range(shards + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(shards) if bounds[i + 1] > bounds[i]]
+
+
+def encode_frames(frame_function: Callable[[float], np.ndarray], start_frame: int, end_frame: int,
+                  fps: float, size: Tuple[int, int], path: str, threads: int = 0) -> str:
+    """Encode frames [start_frame, end_frame) of *frame_function* to *path*
+    (H.264, no audio) by piping raw RGB into ffmpeg, with *threads* x264
+    threads (0: ffmpeg's default)."""
+    w, h = size
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{w}x{h}', '-r', str(fps),
+        '-i', '-',
+        '-an',
+        *x264_args(),
+        '-pix_fmt', 'yuv420p',
+        '-x264-params', 'open-gop=0',
+        '-threads', str(threads),
+        '-movflags', '+faststart',
+        path,
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for i in range(start_frame, end_frame):
+            frame = frame_function(i / fps)
+            if frame.dtype != np.uint8:
+                frame = np.clip(frame, 0, 255).astype(np.uint8)
+            if frame.shape[2] == 4:
+                frame = frame[:, :, :3]
+            proc.stdin.write(np.ascontiguousarray(frame).data)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    finally:
+        stderr = proc.stderr.read()
+        proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg frame encode failed for {path}: {stderr.decode(errors='replace')}")
+    return path
+
+
+def _render_shard(job) -> str:
+    builder, args, start_frame, end_frame, fps, size, path, threads = job
+    return encode_frames(builder(*args), start_frame, end_frame, fps, size, path, threads)
+
+
+def _concat(paths: Sequence[str], output_path: str, audio_source: Optional[str],
+            audio_codec: Sequence[str], duration: float) -> None:
+    list_path = os.path.join(os.path.dirname(os.path.abspath(output_path)), f"{TEMP_PREFIX}concat-{uuid.uuid4().hex[:8]}.txt")
+    with open(list_path, "w") as f:
+        for p in paths:
+            f.write(f"file '{os.path.abspath(p).replace(os.sep, '/')}'\n")
+    try:
+        with atomic_path(output_path) as tmp_path:
+            cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+                   '-f', 'concat', '-safe', '0', '-i', list_path]
+            if audio_source:
+                cmd += ['-i', audio_source, '-map', '0:v:0', '-map', '1:a:0?', '-t', f"{duration:.6f}"]
+            cmd += ['-c:v', 'copy', *audio_codec, '-movflags', '+faststart', tmp_path]
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to join render shards into {output_path}: {e.stderr}")
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+
+def render_sharded(builder: Callable[..., Callable[[float], np.ndarray]], args: Tuple[Any, ...],
+                   duration: float, fps: float, size: Tuple[int, int], output_path: str,
+                   shards: Optional[int] = None, audio_source: Optional[str] = None,
+                   audio_codec: Optional[Sequence[str]] = None) -> str:
+    """Render ``builder(*args)`` over [0, duration) at *fps* and *size* to *output_path*.
+
+    The clip is split into at most *shards* (default RENDER_SHARDS) pieces of
+    at least MIN_SHARD_SECONDS each, fewer when concurrent renders hold part of
+    the worker budget; a single piece renders in this process.
+    When *audio_source* is given its first audio stream is muxed in, copied
+    unless *audio_codec* (ffmpeg audio encoder arguments) says otherwise; the
+    output is cut at *duration* either way.
+    """
+    n_frames = frame_count(duration, fps)
+    shards = shards or RENDER_SHARDS
+    shards = max(1, min(shards, int(n_frames / (MIN_SHARD_SECONDS * fps)) or 1))
+    slots = _acquire_slots(shards)
+    ranges = shard_ranges(n_frames, slots)
+    # Split the cores over the shards actually launched; a lone encode keeps x264's own threading
+    threads = 0 if len(ranges) == 1 else max(1, (os.cpu_count() or 1) // len(ranges))
+
+    base = os.path.join(os.path.dirname(os.path.abspath(output_path)),
+                        f"{TEMP_PREFIX}shard-{uuid.uuid4().hex[:8]}")
+    paths = [f"{base}-{i:03d}.mp4" for i in range(len(ranges))]
+    jobs = [(builder, args, a, b, fps, size, p, threads) for (a, b), p in zip(ranges, paths)]
+    try:
+        if len(jobs) == 1:
+            _render_shard(jobs[0])
+        else:
+            print(f"Rendering {os.path.basename(output_path)} in {len(jobs)} shards")
+            with ProcessPoolExecutor(max_workers=len(jobs), mp_context=_MP_CONTEXT) as pool:
+                list(pool.map(_render_shard, jobs))
+        _concat(paths, output_path, audio_source, audio_codec or ['-c:a', 'copy'], duration)
+    finally:
+        _release_slots(slots)
+        for p in paths:
+            if os.path.exists(p):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+    return output_path
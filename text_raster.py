@@ -0,0 +1,104 @@
+"""
+Cached tight-bounds text rasters for buildShot text items.
+
+A text item is laid out as a full-frame label (moviepy ``TextClip`` with
+``size=(VIDEO_WIDTH, VIDEO_HEIGHT)``), which is almost entirely transparent.
+Here the label is rendered once per (text, font contents, font size, colour,
+stroke, canvas), cropped to the bounding box of its visible pixels, and cached
+in memory and under cache/textrasters. Callers get the tight RGBA raster plus
+its offset inside the canvas, so layout and motion still use the full label
+box while the compositor only scales and blends the glyph pixels.
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from atomic_io import atomic_path, content_hash, valid_cache_entry
+
+CACHE_DIR = "cache/textrasters"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+_LOCK = threading.Lock()
+_MEMORY: Dict[str, Tuple[np.ndarray, Tuple[int, int]]] = {}
+
+
+def _hex(rgb: Tuple[int, int, int]) -> str:
+    return f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}"
+
+
+def _key(text: str, font_path: str, font_size: int, color: Tuple[int, int, int],
+         stroke_color: Optional[Tuple[int, int, int]], stroke_width: int, canvas: Tuple[int, int]) -> str:
+    font_id = content_hash(font_path) if os.path.exists(font_path) else font_path
+    key_src = f"{text}|{font_id}|{font_size}|{color}|{stroke_color}|{stroke_width}|{canvas[0]}x{canvas[1]}"
+    return hashlib.md5(key_src.encode("utf-8")).hexdigest()
+
+
+def _render_label(text: str, font_path: str, font_size: int, color: Tuple[int, int, int],
+                  stroke_color: Optional[Tuple[int, int, int]], stroke_width: int,
+                  canvas: Tuple[int, int]) -> np.ndarray:
+    """Render *text* as moviepy's TextClip does on a *canvas*-sized label -> RGBA array."""
+    from moviepy import TextClip
+
+    clip = TextClip(
+        text=text,
+        font_size=font_size,
+        color=_hex(color),
+        font=font_path,
+        stroke_color=_hex(stroke_color) if stroke_color else None,
+        stroke_width=stroke_width,
+        size=canvas,
+    )
+    rgb = clip.get_frame(0).astype(np.uint8)
+    if clip.mask is not None:
+        alpha = (np.clip(clip.mask.get_frame(0), 0.0, 1.0) * 255).round().astype(np.uint8)
+    else:
+        alpha = np.full(rgb.shape[:2], 255, dtype=np.uint8)
+    return np.dstack([rgb, alpha])
+
+
+def _crop(rgba: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Crop to the bounding box of non-transparent pixels -> (raster, (x, y))."""
+    ys, xs = np.nonzero(rgba[:, :, 3])
+    if len(xs) == 0:
+        return np.zeros((1, 1, 4), dtype=np.uint8), (0, 0)
+    x0, x1, y0, y1 = xs.min(), xs.max() + 1, ys.min(), ys.max() + 1
+    return np.ascontiguousarray(rgba[y0:y1, x0:x1]), (int(x0), int(y0))
+
+
+def _is_valid_npz(path: str) -> bool:
+    try:
+        with np.load(path) as data:
+            return data["rgba"].ndim == 3 and data["offset"].shape == (2,)
+    except Exception:
+        return False
+
+
+def text_raster(text: str, font_path: str, font_size: int, color: Tuple[int, int, int],
+                canvas: Tuple[int, int], stroke_color: Optional[Tuple[int, int, int]] = None,
+                stroke_width: int = 0) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Tight RGBA raster of *text* and its (x, y) offset inside the *canvas*-sized label."""
+    key = _key(text, font_path, font_size, color, stroke_color, stroke_width, canvas)
+    with _LOCK:
+        hit = _MEMORY.get(key)
+    if hit is not None:
+        return hit
+
+    npz_path = os.path.join(CACHE_DIR, key + ".npz")
+    if valid_cache_entry(npz_path, _is_valid_npz):
+        with np.load(npz_path) as data:
+            rgba, offset = data["rgba"], (int(data["offset"][0]), int(data["offset"][1]))
+    else:
+        rgba, offset = _crop(_render_label(text, font_path, font_size, color, stroke_color, stroke_width, canvas))
+        try:
+            with atomic_path(npz_path) as tmp_path:
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, rgba=rgba, offset=np.array(offset, dtype=np.int32))
+        except Exception as e:
+            print(f"Warning: failed to write text raster cache {npz_path}: {e}")
+
+    with _LOCK:
+        _MEMORY[key] = (rgba, offset)
+    return rgba, offset
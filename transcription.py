@@ -0,0 +1,215 @@
+"""
+Content-addressed cache of word-level faster-whisper transcriptions.
+
+Entries are keyed by the SHA-256 of the audio/video bytes plus every setting
+that changes the output (model size, compute type, language, VAD, beam
+size, batched decoding), so renamed files still hit and overwritten files never return stale
+words. Words are stored as parallel arrays rather than one object per word.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from atomic_io import atomic_write_json, content_hash, valid_cache_entry
+from whisper_models import get_whisper_model, DEFAULT_CPU_THREADS
+
+CACHE_DIR = "cache/transcripts"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Bump when the stored layout changes
+CACHE_VERSION = 1
+
+# transcribe_many: files transcribed in parallel on one model (each gets cores / workers threads)
+TRANSCRIBE_NUM_WORKERS = int(os.getenv("TRANSCRIBE_NUM_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+# Segments decoded together per file by faster-whisper's batched pipeline (VAD mode only)
+TRANSCRIBE_BATCH_SIZE = int(os.getenv("TRANSCRIBE_BATCH_SIZE", "8"))
+
+def audio_hash(path: str) -> str:
+    """SHA-256 of the file's contents."""
+    return content_hash(path)
+
+
+def _batched_pipeline_available() -> bool:
+    try:
+        from faster_whisper import BatchedInferencePipeline  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _effective_batch_size(vad_filter: bool, batch_size: int) -> int:
+    """Batch size actually used: the batched pipeline chunks on VAD speech
+    segments, so it needs VAD (and a faster-whisper that has it)."""
+    if batch_size > 1 and vad_filter and _batched_pipeline_available():
+        return int(batch_size)
+    return 1
+
+
+def _settings(model_size: str, compute_type: str, language: Optional[str], vad_filter: bool, beam_size: int,
+              batch_size: int = 1) -> Dict[str, Any]:
+    settings = {
+        "model": model_size,
+        "compute_type": compute_type,
+        "language": language,
+        "vad_filter": bool(vad_filter),
+        "beam_size": int(beam_size),
+    }
+    if batch_size > 1:
+        # Batched decoding gives (slightly) different words; sequential keys are unchanged
+        settings["batch_size"] = int(batch_size)
+    return settings
+
+
+def _cache_path(digest: str, settings: Dict[str, Any]) -> str:
+    key_src = f"{CACHE_VERSION}|{digest}|{json.dumps(settings, sort_keys=True)}".encode("utf-8")
+    return os.path.join(CACHE_DIR, hashlib.md5(key_src).hexdigest() + ".json")
+
+
+def _load(cache_path: str) -> Optional[List[Dict[str, Any]]]:
+    if not valid_cache_entry(cache_path):
+        return None
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return [
+            {"word": w, "start": s, "end": e}
+            for w, s, e in zip(data["word"], data["start"], data["end"])
+        ]
+    except Exception as e:
+        print(f"Warning: failed to read transcription cache {cache_path}: {e}")
+        return None
+
+
+def _save(cache_path: str, settings: Dict[str, Any], words: List[Dict[str, Any]]) -> None:
+    try:
+        atomic_write_json(cache_path, {
+            "settings": settings,
+            "word": [w["word"] for w in words],
+            "start": [round(float(w["start"]), 3) for w in words],
+            "end": [round(float(w["end"]), 3) for w in words],
+        }, ensure_ascii=False, separators=(",", ":"))
+    except Exception as e:
+        print(f"Warning: failed to write transcription cache {cache_path}: {e}")
+
+
+def _run(model, audio_path: str, settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Transcribe one file on *model* and return its words (uncached)."""
+    kwargs = dict(
+        word_timestamps=True,
+        vad_filter=settings["vad_filter"],
+        beam_size=settings["beam_size"],
+        language=settings["language"],
+    )
+    transcriber = model
+    if settings.get("batch_size", 1) > 1:
+        # Batched inference chunks on VAD speech segments, like the sequential
+        # path does with vad_filter, and decodes the chunks together (still
+        # with word timestamps)
+        from faster_whisper import BatchedInferencePipeline
+        transcriber = BatchedInferencePipeline(model=model)
+        kwargs["batch_size"] = settings["batch_size"]
+    # Feed the memory-mapped 16 kHz PCM so the file is not decoded again per run
+    from pcm_cache import get_asr_pcm
+    segments, _info = transcriber.transcribe(get_asr_pcm(str(audio_path)), **kwargs)
+
+    words: List[Dict[str, Any]] = []
+    for seg in segments:
+        if not getattr(seg, "words", None):
+            if seg.text.strip():
+                words.append({"word": seg.text, "start": float(seg.start), "end": float(seg.end)})
+            continue
+        for w in seg.words:
+            words.append({"word": w.word, "start": float(w.start), "end": float(w.end)})
+    return words
+
+
+def transcribe_words(audio_path: str,
+                     model_size: str = "small",
+                     device: str = "cpu",
+                     compute_type: str = "int8",
+                     language: Optional[str] = None,
+                     vad_filter: bool = False,
+                     beam_size: int = 5,
+                     cpu_threads: int = DEFAULT_CPU_THREADS) -> List[Dict[str, Any]]:
+    """Word-level transcription of *audio_path* (cached by content):
+    [{"word": str, "start": float, "end": float}, ...].
+
+    Segments without word timings are returned as a single entry holding the
+    segment text. *device* and *cpu_threads* do not change the result, so
+    they are not part of the cache key.
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    settings = _settings(model_size, compute_type, language, vad_filter, beam_size)
+    cache_path = _cache_path(audio_hash(audio_path), settings)
+    cached = _load(cache_path)
+    if cached is not None:
+        print(f"Whisper: Using cached transcription for {os.path.basename(audio_path)}")
+        return cached
+
+    print(f"Whisper: Transcribing {os.path.basename(audio_path)}")
+    model = get_whisper_model(model_size, device, compute_type, cpu_threads)
+    words = _run(model, audio_path, settings)
+    _save(cache_path, settings, words)
+    return words
+
+
+def transcribe_many(audio_paths: Iterable[str],
+                    model_size: str = "small",
+                    device: str = "cpu",
+                    compute_type: str = "int8",
+                    language: Optional[str] = None,
+                    vad_filter: bool = False,
+                    beam_size: int = 5,
+                    num_workers: Optional[int] = None,
+                    batch_size: int = TRANSCRIBE_BATCH_SIZE,
+                    cpu_threads: int = DEFAULT_CPU_THREADS) -> Dict[str, List[Dict[str, Any]]]:
+    """Transcribe a queue of files and return {path: words} (same format and
+    cache as transcribe_words).
+
+    Cache hits are served first; the remaining files run concurrently (up to
+    *num_workers*) on one shared batch model, always loaded with
+    TRANSCRIBE_NUM_WORKERS parallel workers and cores / TRANSCRIBE_NUM_WORKERS
+    threads each, so decode and Python bookkeeping of one file overlap with
+    inference of the others. A single file runs on the default model
+    (*cpu_threads*, as transcribe_words loads it). With VAD on, each file is
+    also decoded with faster-whisper's batched pipeline (*batch_size*
+    segments at a time).
+    """
+    settings = _settings(model_size, compute_type, language, vad_filter, beam_size,
+                         _effective_batch_size(vad_filter, batch_size))
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    pending: List[str] = []
+    for path in dict.fromkeys(audio_paths):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Audio file not found: {path}")
+        cached = _load(_cache_path(audio_hash(path), settings))
+        if cached is not None:
+            results[path] = cached
+        else:
+            pending.append(path)
+    if not pending:
+        return results
+
+    workers = max(1, min(num_workers or TRANSCRIBE_NUM_WORKERS, TRANSCRIBE_NUM_WORKERS, len(pending)))
+    if workers == 1:
+        # Nothing to overlap: reuse the default (likely already warm) model
+        model = get_whisper_model(model_size, device, compute_type, cpu_threads)
+    else:
+        # One fixed batch configuration, so every batch size shares a single loaded model
+        threads = max(1, (os.cpu_count() or TRANSCRIBE_NUM_WORKERS) // TRANSCRIBE_NUM_WORKERS)
+        model = get_whisper_model(model_size, device, compute_type, threads, num_workers=TRANSCRIBE_NUM_WORKERS)
+    print(f"Whisper: Transcribing {len(pending)} files ({workers} workers, {len(results)} cached)")
+
+    def _one(path: str):
+        words = _run(model, path, settings)
+        _save(_cache_path(audio_hash(path), settings), settings, words)
+        return path, words
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, words in executor.map(_one, pending):
+            results[path] = words
+    return results
@@ -0,0 +1,113 @@
+"""
+Word timings from the TTS provider's own alignment data.
+
+ElevenLabs (via FAL) can return character-level timestamps with the audio.
+getTTS stores them next to the mp3 as ``<hash>.align.json`` (as words), and
+getTimestamps prefers them over forced alignment or ASR.
+
+``parse_alignment`` is a pure function over the provider's JSON response, so
+it can be exercised with a saved or hand-written stand-in response:
+
+    >>> parse_alignment({"alignment": {"characters": list("hi yo"),
+    ...     "character_start_times_seconds": [0, .1, .2, .3, .4],
+    ...     "character_end_times_seconds": [.1, .2, .3, .4, .5]}})
+    [{'word': 'hi', 'start': 0.0, 'end': 0.2}, {'word': 'yo', 'start': 0.3, 'end': 0.5}]
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from atomic_io import atomic_write_json, valid_cache_entry
+
+# Response keys that may carry the alignment, in order of preference
+_ALIGNMENT_KEYS = ("timestamps", "alignment", "normalized_alignment")
+
+
+def alignment_path(audio_path: str) -> str:
+    """Sidecar path for *audio_path* (the mp3 or its canonical WAV share it)."""
+    return os.path.splitext(audio_path)[0] + ".align.json"
+
+
+def _words_from_characters(chars: List[str], starts: List[float], ends: List[float]) -> List[Dict[str, Any]]:
+    words: List[Dict[str, Any]] = []
+    current, w_start, w_end = "", None, None
+    for ch, s, e in zip(chars, starts, ends):
+        if ch.isspace():
+            if current:
+                words.append({"word": current, "start": float(w_start), "end": float(w_end)})
+            current, w_start, w_end = "", None, None
+            continue
+        if not current:
+            w_start = s
+        current += ch
+        w_end = e
+    if current:
+        words.append({"word": current, "start": float(w_start), "end": float(w_end)})
+    return words
+
+
+def _parse_block(block: Any) -> Optional[List[Dict[str, Any]]]:
+    if isinstance(block, dict):
+        if "characters" in block:
+            return _words_from_characters(
+                list(block["characters"]),
+                list(block.get("character_start_times_seconds") or []),
+                list(block.get("character_end_times_seconds") or []),
+            )
+        if "words" in block:
+            return _parse_block(block["words"])
+        return None
+    if isinstance(block, list):
+        if all(isinstance(b, dict) and "characters" in b for b in block):
+            # Chunked character alignment (times are absolute)
+            words: List[Dict[str, Any]] = []
+            for b in block:
+                words.extend(_parse_block(b) or [])
+            return words
+        words = []
+        for w in block:
+            if not isinstance(w, dict):
+                return None
+            text = str(w.get("word", w.get("text", ""))).strip()
+            start = w.get("start", w.get("start_time"))
+            end = w.get("end", w.get("end_time"))
+            if not text or start is None or end is None:
+                continue
+            words.append({"word": text, "start": float(start), "end": float(end)})
+        return words
+    return None
+
+
+def parse_alignment(response: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Words [{"word", "start", "end"}] from a TTS response, or None if it
+    carries no usable alignment. Accepts character-level alignment
+    (ElevenLabs) or word lists."""
+    for key in _ALIGNMENT_KEYS:
+        block = response.get(key) if isinstance(response, dict) else None
+        if block:
+            words = _parse_block(block)
+            if words:
+                return words
+    return None
+
+
+def save_alignment(audio_path: str, response: Dict[str, Any]) -> bool:
+    """Parse *response* and store its words next to *audio_path*; False if none."""
+    words = parse_alignment(response)
+    if not words:
+        return False
+    atomic_write_json(alignment_path(audio_path), {"words": words}, ensure_ascii=False)
+    return True
+
+
+def load_alignment(audio_path: str) -> Optional[List[Dict[str, Any]]]:
+    """Stored provider words for *audio_path*, or None."""
+    path = alignment_path(audio_path)
+    if not valid_cache_entry(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["words"]
+    except Exception as e:
+        print(f"Warning: failed to read TTS alignment {path}: {e}")
+        return None
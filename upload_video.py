@@ -9,7 +9,7 @@ Required scopes:
 import http.client as httplib
 import httplib2
 import json
-import os, random, shutil, subprocess, sys, time
+import os, shutil, subprocess, sys, time
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
@@ -18,6 +18,7 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 import argparse
 from types import SimpleNamespace
+from retry_policy import backoff_delay, retry_after_seconds
 
 # ─── Retry / upload constants ──────────────────────────────────────────────────
 httplib2.RETRIES = 1
@@ -129,16 +130,20 @@ def resumable_upload(insert_request):
         except HttpError as e:
             if e.resp.status in RETRIABLE_STATUS_CODES:
                 error = f"A retriable HTTP error {e.resp.status}: {e.content}"
+                retry_after = retry_after_seconds(e.resp)
             else:
                 raise
         except RETRIABLE_EXCEPTIONS as e:
             error = f"A retriable error occurred: {e}"
+            retry_after = None
 
         if error:
             retry += 1
             if retry > MAX_RETRIES:
                 sys.exit("Giving up.")
-            sleep = random.random() * (2 ** retry)
+            # Shared jittered exponential backoff (honours Retry-After)
+            sleep = backoff_delay("youtube", retry, retry_after)
+            print(f"{error}; retrying in {sleep:.1f}s")
             time.sleep(sleep)
             error = None  # Reset error for next iteration
 
@@ -0,0 +1,183 @@
+"""
+Whisper speed/accuracy benchmark.
+
+Runs a fixture set of TTS clips through candidate (model, compute type, beam
+size) configurations, measuring wall time, peak RSS and word-timestamp error
+against a reference configuration, and writes the fastest configuration that
+stays within tolerance to whisper_config.json, which getTimestamps and
+captions read at startup.
+
+    python whisperBenchmark.py                      # clips from cache/tts
+    python whisperBenchmark.py --fixtures dir/ --limit 20
+
+Each configuration runs in its own subprocess so model memory does not add
+up across candidates and peak RSS is measured per configuration.
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from getTimestamps import _norm
+from whisper_models import WHISPER_CONFIG_PATH
+
+# (model, compute_type, beam_size); the first entry is the reference
+CANDIDATES = [
+    ("small", "int8", 5),
+    ("small", "int8", 1),
+    ("base", "int8", 5),
+    ("base", "int8", 1),
+    ("base.en", "int8", 1),
+    ("tiny", "int8", 1),
+]
+
+# A candidate qualifies if its matched words start within this many seconds
+# of the reference on average and it recovers this share of the reference words
+MAX_MEAN_ERROR_SECONDS = 0.05
+MIN_WORD_MATCH_RATE = 0.97
+
+
+def _fixtures(fixtures_dir: str, limit: int) -> List[str]:
+    if fixtures_dir:
+        paths = sorted(glob.glob(os.path.join(fixtures_dir, "*.wav")) + glob.glob(os.path.join(fixtures_dir, "*.mp3")))
+    else:
+        # Canonical WAVs of cached TTS clips
+        paths = sorted(p for p in glob.glob(os.path.join("cache", "tts", "*.wav")))
+    return paths[:limit]
+
+
+def _worker(config: Dict[str, Any], paths: List[str]) -> None:
+    """Subprocess entry point: transcribe *paths* uncached with *config* and
+    print one JSON line with words, timings and peak RSS."""
+    import resource
+    from whisper_models import get_whisper_model
+    from transcription import _run, _settings
+
+    t0 = time.perf_counter()
+    model = get_whisper_model(config["model"], "cpu", config["compute_type"], config.get("cpu_threads", 0))
+    load_seconds = time.perf_counter() - t0
+
+    settings = _settings(config["model"], config["compute_type"], None, False, config["beam_size"])
+    words = {}
+    t1 = time.perf_counter()
+    for path in paths:
+        words[path] = _run(model, path, settings)
+    transcribe_seconds = time.perf_counter() - t1
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "transcribe_seconds": transcribe_seconds,
+        "peak_rss_mb": peak_rss_mb,
+        "words": words,
+    }))
+
+
+def _run_config(config: Dict[str, Any], paths: List[str]) -> Dict[str, Any]:
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(config), *paths]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-2000:])
+    # The worker's JSON is the last line; model loading may print before it
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _timestamp_error(reference: List[Dict[str, Any]], candidate: List[Dict[str, Any]]):
+    """(sum of |start error| over matched words, matched words, reference words)."""
+    ref_tokens = [_norm(w["word"]) for w in reference]
+    cand_tokens = [_norm(w["word"]) for w in candidate]
+    matcher = difflib.SequenceMatcher(None, ref_tokens, cand_tokens, autojunk=False)
+    total, matched = 0.0, 0
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            total += abs(float(reference[block.a + k]["start"]) - float(candidate[block.b + k]["start"]))
+            matched += 1
+    return total, matched, len(reference)
+
+
+def benchmark(paths: List[str], candidates=CANDIDATES) -> Dict[str, Any]:
+    results = []
+    reference_words = None
+    for model, compute_type, beam_size in candidates:
+        config = {"model": model, "compute_type": compute_type, "beam_size": beam_size}
+        print(f"Benchmark: {config} on {len(paths)} clips")
+        try:
+            run = _run_config(config, paths)
+        except Exception as e:
+            print(f"Warning: benchmark of {config} failed: {e}")
+            continue
+        if reference_words is None:
+            reference_words = run["words"]
+
+        err_sum = matched = ref_total = 0
+        for path in paths:
+            e, m, r = _timestamp_error(reference_words.get(path, []), run["words"].get(path, []))
+            err_sum += e
+            matched += m
+            ref_total += r
+        entry = {
+            **config,
+            "load_seconds": round(run["load_seconds"], 3),
+            "transcribe_seconds": round(run["transcribe_seconds"], 3),
+            "peak_rss_mb": round(run["peak_rss_mb"], 1),
+            "mean_start_error_seconds": round(err_sum / matched, 4) if matched else None,
+            "word_match_rate": round(matched / ref_total, 4) if ref_total else None,
+        }
+        print(f"Benchmark: {entry}")
+        results.append(entry)
+
+    if not results:
+        raise RuntimeError("No configuration could be benchmarked.")
+
+    qualifying = [
+        r for r in results
+        if r["mean_start_error_seconds"] is not None
+        and r["mean_start_error_seconds"] <= MAX_MEAN_ERROR_SECONDS
+        and (r["word_match_rate"] or 0) >= MIN_WORD_MATCH_RATE
+    ]
+    best = min(qualifying or results[:1], key=lambda r: r["transcribe_seconds"])
+    return {
+        "recommended": {k: best[k] for k in ("model", "compute_type", "beam_size")},
+        "reference": results[0],
+        "results": results,
+        "fixtures": len(paths),
+        "thresholds": {
+            "max_mean_start_error_seconds": MAX_MEAN_ERROR_SECONDS,
+            "min_word_match_rate": MIN_WORD_MATCH_RATE,
+        },
+        "timestamp": time.time(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper configurations on TTS clips.")
+    parser.add_argument("--fixtures", default="", help="Directory of .wav/.mp3 clips (default: cache/tts)")
+    parser.add_argument("--limit", type=int, default=12, help="Maximum number of clips")
+    parser.add_argument("--output", default=WHISPER_CONFIG_PATH, help="Where to write the recommendation")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(json.loads(args.worker), args.paths)
+        return
+
+    paths = _fixtures(args.fixtures, args.limit)
+    if not paths:
+        raise SystemExit("No fixture clips found.")
+
+    report = benchmark(paths)
+    from atomic_io import atomic_write_json
+    atomic_write_json(args.output, report, indent=2)
+    print(f"Benchmark: recommended {report['recommended']} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Process-wide registry of loaded faster-whisper models.
+
+Loading a WhisperModel (~500 MB for "small") costs far more than transcribing
+a few seconds of TTS, so every configuration is loaded once per process and
+shared by getTimestamps and captions. ``preload_whisper_model`` starts the
+load on a background thread so it overlaps with Gemini/TTS work at startup.
+
+Which model/compute type/beam size to use comes from ``whisper_config.json``
+when present (written by whisperBenchmark.py), else the defaults below.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_MODEL_SIZE = "small"
+DEFAULT_DEVICE = "cpu"
+DEFAULT_COMPUTE_TYPE = "int8"
+# 0 lets CTranslate2 pick (all physical cores)
+DEFAULT_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+DEFAULT_BEAM_SIZE = 5
+
+WHISPER_CONFIG_PATH = os.getenv("WHISPER_CONFIG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "whisper_config.json"))
+
+_CONFIG: Optional[Dict[str, Any]] = None
+
+
+def load_whisper_config() -> Dict[str, Any]:
+    """Return {"model", "compute_type", "beam_size", "cpu_threads"}: the
+    benchmark's recommendation if whisper_config.json exists, else defaults."""
+    global _CONFIG
+    if _CONFIG is not None:
+        return _CONFIG
+    config = {
+        "model": DEFAULT_MODEL_SIZE,
+        "compute_type": DEFAULT_COMPUTE_TYPE,
+        "beam_size": DEFAULT_BEAM_SIZE,
+        "cpu_threads": DEFAULT_CPU_THREADS,
+    }
+    if os.path.exists(WHISPER_CONFIG_PATH):
+        try:
+            with open(WHISPER_CONFIG_PATH, "r", encoding="utf-8") as f:
+                recommended = json.load(f).get("recommended", {})
+            config.update({k: recommended[k] for k in config if k in recommended})
+            print(f"Whisper: Using benchmarked config {config}")
+        except Exception as e:
+            print(f"Warning: failed to read {WHISPER_CONFIG_PATH}: {e}")
+    _CONFIG = config
+    return config
+
+_ModelKey = Tuple[str, str, str, int, int]
+
+_REGISTRY_LOCK = threading.Lock()
+_MODELS: Dict[_ModelKey, object] = {}
+_KEY_LOCKS: Dict[_ModelKey, threading.Lock] = {}
+
+
+def _key_lock(key: _ModelKey) -> threading.Lock:
+    with _REGISTRY_LOCK:
+        lock = _KEY_LOCKS.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _KEY_LOCKS[key] = lock
+        return lock
+
+
+def get_whisper_model(size: str = DEFAULT_MODEL_SIZE,
+                      device: str = DEFAULT_DEVICE,
+                      compute_type: str = DEFAULT_COMPUTE_TYPE,
+                      cpu_threads: int = DEFAULT_CPU_THREADS,
+                      num_workers: int = 1):
+    """Return the shared WhisperModel for this configuration, loading it on first use.
+
+    Concurrent callers asking for the same configuration wait for a single load;
+    different configurations load independently. *num_workers* > 1 lets that
+    many transcriptions run in parallel on the one model.
+    """
+    key = (size, device, compute_type, int(cpu_threads), int(num_workers))
+    model = _MODELS.get(key)
+    if model is not None:
+        return model
+
+    with _key_lock(key):
+        model = _MODELS.get(key)
+        if model is not None:
+            return model
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError(
+                "faster_whisper is required for transcription. Install with 'pip install faster-whisper'"
+            ) from e
+        print(f"Whisper: Loading model {size} ({device}, {compute_type}, cpu_threads={cpu_threads}, num_workers={num_workers})")
+        model = WhisperModel(size, device=device, compute_type=compute_type,
+                             cpu_threads=int(cpu_threads), num_workers=int(num_workers))
+        _MODELS[key] = model
+        return model
+
+
+def preload_whisper_model(size: str = DEFAULT_MODEL_SIZE,
+                          device: str = DEFAULT_DEVICE,
+                          compute_type: str = DEFAULT_COMPUTE_TYPE,
+                          cpu_threads: int = DEFAULT_CPU_THREADS) -> threading.Thread:
+    """Start loading a model in a daemon thread; later get_whisper_model calls
+    for the same configuration block until it is ready instead of loading twice."""
+    def _load():
+        try:
+            get_whisper_model(size, device, compute_type, cpu_threads)
+        except Exception as e:
+            print(f"Warning: Whisper preload failed: {e}")
+
+    thread = threading.Thread(target=_load, name=f"whisper-preload-{size}", daemon=True)
+    thread.start()
+    return thread